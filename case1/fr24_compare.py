@@ -0,0 +1,13 @@
+"""Moved to the shared fr24 package (fr24.compare); kept so existing commands and imports keep working."""
+import os
+import sys
+
+try:
+    import fr24.compare
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import fr24.compare
+
+if __name__ == '__main__':
+    sys.exit(fr24.compare.main())
+sys.modules[__name__] = fr24.compare
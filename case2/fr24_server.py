@@ -0,0 +1,13 @@
+"""Moved to the shared fr24 package (fr24.server); kept so existing commands and imports keep working."""
+import os
+import sys
+
+try:
+    import fr24.server
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import fr24.server
+
+if __name__ == '__main__':
+    sys.exit(fr24.server.main())
+sys.modules[__name__] = fr24.server
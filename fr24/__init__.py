@@ -0,0 +1,18 @@
+"""FR24 API helpers for airport arrival/departure analysis.
+
+The helpers live in fr24.helpers and are re-exported here on first access,
+so `import fr24` (and the `fr24` command) stays cheap until they are used.
+"""
+
+import importlib
+
+__version__ = '0.1.0'
+
+
+def __getattr__(name):
+    # import_module, not `from . import helpers`, which would look helpers up through this hook
+    helpers = importlib.import_module('.helpers', __name__)
+    try:
+        return getattr(helpers, name)
+    except AttributeError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
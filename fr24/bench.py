@@ -0,0 +1,213 @@
+"""Synthetic FR24 workloads and per-stage benchmarks for the detection pipeline.
+
+Run from the case directory, e.g.:
+    python -m fr24.bench --flights 1000 --timestamps 100
+    python -m fr24.bench --flights 1000 --timestamps 100 --update-baseline
+The second form stores the results as the baseline that later runs are compared
+against; a stage slower (or using more memory) than baseline * (1 + tolerance)
+is reported as a regression and the script exits with status 1.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from .helpers import (
+    snapshot_to_dataframe, add_distance_to_airport, pivot_pair, enhance_dataframe_with_distances,
+    clean_data_arrivals, clean_data_departures, IntervalStream,
+)
+
+# Default airport for synthetic traffic (Stockholm Arlanda)
+DEFAULT_AIRPORT = {'iata': 'ARN', 'lat': 59.651901, 'lon': 17.918600}
+
+# Other airports used as origins/destinations
+OTHER_AIRPORTS = ['CPH', 'OSL', 'HEL', 'LHR', 'CDG', 'FRA', 'AMS', 'GOT', 'BKK', 'EWR']
+
+AIRCRAFT_TYPES = ['A20N', 'A320', 'B738', 'A321', 'E190', 'AT76', 'A359', 'B77W']
+AIRLINES = ['SAS', 'NAX', 'RYR', 'DLH', 'AFR', 'KLM', 'FIN', 'THA']
+
+DEFAULT_BASELINE = "./bench_baseline.json"
+
+
+# Generate synthetic snapshots around an airport
+def generate_snapshots(n_flights=1000, n_timestamps=100, interval_minutes=30, airport=DEFAULT_AIRPORT,
+                       start_time=datetime(2025, 2, 20, 5, 0, tzinfo=timezone.utc), missing_rate=0.02, seed=0):
+    """Yield (timestamp, flights) pairs shaped like /historic/flight-positions/full.
+    Each flight is an arrival (descending approach, ground roll, taxi-in) or a
+    departure (ground time, take-off roll, climb-out) with its runway event
+    spread over the whole window. Fields are dropped at missing_rate to mimic
+    incomplete API records."""
+    rng = np.random.default_rng(seed)
+    duration_min = n_timestamps * interval_minutes
+    arrival = rng.random(n_flights) < 0.5
+    event_min = rng.uniform(0, duration_min, n_flights)  # Touchdown or take-off time
+    airborne_min = rng.uniform(45, 240, n_flights)  # Time spent airborne inside the window
+    ground_min = rng.uniform(5, 40, n_flights)  # Taxi-in or time at the gate before departure
+    cruise_kts = rng.uniform(380, 490, n_flights)
+    cruise_ft = rng.choice([33000, 35000, 37000, 39000], n_flights)
+    bearing = np.radians(rng.uniform(0, 360, n_flights))
+    runway_heading = rng.choice([10, 190, 80, 260], n_flights)
+    ids = np.array([f"{0x39000000 + i:08x}" for i in range(n_flights)])
+    flight_numbers = np.array([f"{AIRLINES[i % len(AIRLINES)][:2]}{100 + i % 9000}" for i in range(n_flights)])
+    aircraft = rng.choice(AIRCRAFT_TYPES, n_flights)
+    operator = rng.choice(AIRLINES, n_flights)
+    other = rng.choice(OTHER_AIRPORTS, n_flights)
+
+    visible_from = np.where(arrival, event_min - airborne_min, event_min - ground_min)
+    visible_to = np.where(arrival, event_min + ground_min, event_min + airborne_min)
+    cos_lat = np.cos(np.radians(airport['lat']))
+
+    for step in range(n_timestamps + 1):
+        t = step * interval_minutes
+        timestamp = start_time + timedelta(minutes=t)
+        active = np.flatnonzero((visible_from <= t) & (t <= visible_to))
+
+        # Minutes airborne away from the airport (0 on the ground)
+        offset = np.where(arrival[active], event_min[active] - t, t - event_min[active])
+        airborne = offset > 0
+        distance_km = np.where(airborne, offset / 60 * cruise_kts[active] * 1.852 * 0.8, 0.0)
+        altitude = np.where(airborne, np.minimum(cruise_ft[active], distance_km * 330), 0).astype(int)
+        speed = np.where(airborne, np.minimum(cruise_kts[active], 140 + distance_km * 3), rng.integers(0, 25, len(active)))
+        vspeed = np.where(airborne & (altitude < cruise_ft[active]), np.where(arrival[active], -800, 1500), 0)
+        lat = airport['lat'] + distance_km * np.cos(bearing[active]) / 111.0 + rng.normal(0, 0.005, len(active))
+        lon = airport['lon'] + distance_km * np.sin(bearing[active]) / (111.0 * cos_lat) + rng.normal(0, 0.01, len(active))
+        track = np.where(airborne, (np.degrees(bearing[active]) + np.where(arrival[active], 180, 0)) % 360,
+                         runway_heading[active])
+        eta = [
+            (start_time + timedelta(minutes=float(event_min[i] if arrival[i] else event_min[i] + 120))).isoformat()
+            for i in active
+        ]
+
+        flights = []
+        drop = rng.random((len(active), 3)) < missing_rate
+        for k, i in enumerate(active):
+            origin, destination = (other[i], airport['iata']) if arrival[i] else (airport['iata'], other[i])
+            flights.append({
+                'fr24_id': ids[i],
+                'flight': None if drop[k, 0] else flight_numbers[i],
+                'callsign': f"{operator[i]}{100 + i % 9000}",
+                'lat': round(float(lat[k]), 5),
+                'lon': round(float(lon[k]), 5),
+                'track': int(track[k]),
+                'alt': None if drop[k, 1] else int(altitude[k]),
+                'gspeed': int(speed[k]),
+                'vspeed': int(vspeed[k]),
+                'source': 'ADSB',
+                'type': aircraft[i],
+                'operating_as': operator[i],
+                'orig_iata': None if drop[k, 2] else origin,
+                'dest_iata': destination,
+                'eta': eta[k],
+            })
+        yield timestamp, flights
+
+
+# Time each pipeline stage over a synthetic workload
+def run_benchmark(n_flights, n_timestamps, interval_minutes=30, airport=DEFAULT_AIRPORT, radius_km=5,
+                  measure_memory=True, seed=0):
+    """Return {stage: {'seconds': total, 'peak_mb': peak}} for ingest, pivot,
+    enhance, arrivals, departures and the end-to-end IntervalStream. peak_mb is
+    the largest allocation above what was live when the stage started. Snapshot
+    generation is excluded from the timings."""
+    stages = ['ingest', 'pivot', 'enhance', 'arrivals', 'departures', 'stream']
+    results = {stage: {'seconds': 0.0, 'peak_mb': 0.0} for stage in stages}
+    iata, lat, lon = airport['iata'], airport['lat'], airport['lon']
+
+    def timed(stage, func, *args, **kwargs):
+        if measure_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            value = func(*args, **kwargs)
+        results[stage]['seconds'] += time.perf_counter() - start
+        if measure_memory:
+            peak = (tracemalloc.get_traced_memory()[1] - before) / 2**20
+            results[stage]['peak_mb'] = max(results[stage]['peak_mb'], peak)
+        return value
+
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        previous = None
+        stream = IntervalStream(iata, lat, lon, radius_km, interval_minutes)
+        for timestamp, flights in generate_snapshots(n_flights, n_timestamps, interval_minutes, airport, seed=seed):
+            frame = timed('ingest', lambda: add_distance_to_airport(snapshot_to_dataframe(flights, timestamp), lat, lon))
+            timed('stream', stream.push, timestamp, flights)
+            if previous is not None:
+                merged = timed('pivot', pivot_pair, previous, frame)
+                merged = timed('enhance', enhance_dataframe_with_distances, merged, interval_minutes, lat, lon)
+                timed('arrivals', clean_data_arrivals, merged, iata, lat, lon, radius_km)
+                timed('departures', clean_data_departures, merged, iata, lat, lon, radius_km)
+            previous = frame
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+    return results
+
+
+# Compare results against stored baselines
+def find_regressions(results, baseline, tolerance=0.25):
+    """Return a list of human-readable regressions of results versus baseline."""
+    regressions = []
+    for stage, metrics in results.items():
+        reference = baseline.get(stage)
+        if not reference:
+            continue
+        for metric in ('seconds', 'peak_mb'):
+            limit = reference.get(metric, 0) * (1 + tolerance)
+            if reference.get(metric) and metrics[metric] > limit:
+                regressions.append(
+                    f"{stage}.{metric}: {metrics[metric]:.3f} > {reference[metric]:.3f} (+{tolerance:.0%} allowed)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the FR24 detection pipeline on synthetic snapshots.")
+    parser.add_argument('--flights', type=int, default=1000)
+    parser.add_argument('--timestamps', type=int, default=100)
+    parser.add_argument('--interval-minutes', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc peak measurement")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.flights, args.timestamps, args.interval_minutes,
+                            measure_memory=not args.no_memory, seed=args.seed)
+    workload = f"flights={args.flights},timestamps={args.timestamps},interval={args.interval_minutes:g}"
+    print(f"=== Benchmark: {workload} ===")
+    for stage, metrics in results.items():
+        print(f"{stage:<12} {metrics['seconds']:>9.3f} s  {metrics['peak_mb']:>9.1f} MB peak")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+    if args.update_baseline:
+        baselines[workload] = results
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline for {workload} saved to {args.baseline}")
+        return 0
+
+    if workload not in baselines:
+        print(f"No baseline for {workload} in {args.baseline}")
+        return 0
+    regressions = find_regressions(results, baselines[workload], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Persistent caches for FR24 API responses and static metadata.
+
+Only the standard library (plus orjson when installed) is imported here, so
+cache inspection does not pay for pandas/NumPy start-up.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Use orjson for response decoding when it is installed
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# Default location of the persistent snapshot cache
+CACHE_DIR = "./Cache"
+
+
+class SnapshotCacheMiss(KeyError):
+    """Raised by an offline SnapshotCache when a request is not cached."""
+
+
+# Temporary file name unique to this process and thread, for atomic writes
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+# Remove a file another thread or process may already have removed
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Persistent key -> value cache for slowly changing metadata
+class MetadataCache:
+    """Small JSON-file cache for static metadata such as airline lookups.
+    Each entry expires after ttl_days; None values record negative results
+    (e.g. unknown ICAO codes) and expire after negative_ttl_days.
+    set() only updates memory: call save() once after a batch of lookups, or
+    use the cache as a context manager to save on exit."""
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "airlines.json"), ttl_days=30, negative_ttl_days=1):
+        self.path = path
+        self.ttl_days = ttl_days
+        self.negative_ttl_days = negative_ttl_days
+        self._lock = threading.Lock()
+        self._dirty = False
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self._entries = {}
+
+    def get(self, key):
+        """Return (hit, value); expired entries count as misses."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        stored_at, value = entry
+        ttl_days = self.ttl_days if value is not None else self.negative_ttl_days
+        if time.time() - stored_at > ttl_days * 86400:
+            return False, None
+        return True, value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = [time.time(), value]
+            self._dirty = True
+
+    def save(self):
+        """Write the cache to disk atomically, if anything changed since the last save."""
+        if not self._dirty:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = _tmp_path(self.path)
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, separators=(',', ':'))
+            self._dirty = False
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Persistent on-disk cache for API responses
+class SnapshotCache:
+    """Content-addressed cache of FR24 API responses stored as gzip JSON files.
+    Entries are keyed by endpoint + all query params, so historic snapshots
+    are only ever paid for once. Old entries are evicted by age (max_age_days)
+    and least-recently-used entries by total size (max_bytes). Writes trigger
+    an eviction pass once evict_every_bytes have been written since the last
+    one (default max_bytes / 16), so a put does not scan the whole directory
+    and the cache may exceed max_bytes by that much in between.
+    With offline=True a miss raises SnapshotCacheMiss instead of calling the API.
+    Safe to share between threads."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=512 * 1024 * 1024, max_age_days=None, offline=False,
+                 evict_every_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.offline = offline
+        self.evict_every_bytes = evict_every_bytes or (max_bytes // 16 if max_bytes else 16 * 1024 * 1024)
+        self._written = 0  # Bytes written since the last eviction pass
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, endpoint, params):
+        """Return the content address for an endpoint + params pair."""
+        payload = json.dumps({'endpoint': endpoint, 'params': params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def get(self, endpoint, params):
+        """Return the cached response or None. Raises SnapshotCacheMiss when offline."""
+        path = self._path(self.key(endpoint, params))
+        try:
+            if self._expired(os.stat(path).st_mtime):
+                _remove(path)
+                raise FileNotFoundError(path)
+            with gzip.open(path, 'rb') as f:
+                data = _json_loads(f.read())
+        except (FileNotFoundError, OSError, ValueError):
+            if self.offline:
+                raise SnapshotCacheMiss(f"{endpoint} {params} not in cache (offline mode)")
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except FileNotFoundError:
+            pass  # Evicted since the read; the data is still good
+        return data
+
+    def put(self, endpoint, params, data):
+        """Store a response, evicting entries beyond the size/age limits every
+        evict_every_bytes written."""
+        path = self._path(self.key(endpoint, params))
+        tmp_path = _tmp_path(path)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(data, f, separators=(',', ':'))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)  # Atomic so readers never see partial files
+        with self._lock:
+            self._written += size
+            due = self._written >= self.evict_every_bytes
+        if due:
+            self.evict()
+
+    def _expired(self, mtime):
+        return self.max_age_days is not None and time.time() - mtime > self.max_age_days * 86400
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith('.json.gz'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue  # Removed by another thread or process
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove expired entries, then the least recently used until under max_bytes."""
+        with self._lock:
+            self._written = 0
+            entries = []
+            for mtime, size, path in self._entries():
+                if self._expired(mtime):
+                    _remove(path)
+                else:
+                    entries.append((mtime, size, path))
+            total = sum(size for _, size, _ in entries)
+            if self.max_bytes is None:
+                return
+            for mtime, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                _remove(path)
+                total -= size
+
+    def stats(self):
+        """Return entry count and total size of the cache on disk."""
+        entries = self._entries()
+        return {'entries': len(entries), 'total_bytes': sum(size for _, size, _ in entries)}
+
+    def clear(self):
+        """Delete every cached entry."""
+        with self._lock:
+            for _, _, path in self._entries():
+                _remove(path)
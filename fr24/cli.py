@@ -0,0 +1,276 @@
+"""`fr24` command-line entry point.
+
+    fr24 collect ARN --start 2025-02-20T05:00Z --hours 6 --interval-minutes 30
+    fr24 detect ARN --start 2025-02-20T05:00Z --hours 6 --interval-minutes 30 --offline
+    fr24 detect ARN --start 2025-02-01T00:00Z --hours 672 --interval-minutes 30 --chunk-hours 24
+    fr24 compare departures --reference Outputs/flight_departures.csv --detections Outputs/all_departures_df.csv
+    fr24 report --flights Outputs/all_flights_df.csv
+    fr24 cache stats
+
+Only the standard library is imported at start-up; each subcommand imports the
+modules it needs (pandas, NumPy and requests come in with fr24.helpers), so
+`fr24 cache` and `fr24 --help` return without loading them.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from .cache import CACHE_DIR
+
+# Environment variable holding the FR24 API token
+TOKEN_ENV = 'FR24_API_TOKEN'
+
+
+# Request headers for the FR24 API
+def make_headers(token=None):
+    token = token or os.environ.get(TOKEN_ENV)
+    if not token:
+        raise SystemExit(f"An FR24 API token is required (--token or {TOKEN_ENV})")
+    return {'Accept': 'application/json', 'Accept-Version': 'v1', 'Authorization': f'Bearer {token}'}
+
+# Request headers, with the shared client for them paced at --rate requests per second
+def _api_headers(args):
+    from .helpers import get_client
+    headers = make_headers(args.token)
+    get_client(headers, rate=args.rate)
+    return headers
+
+# Parse an ISO 8601 time, treating times without an offset as UTC
+def _utc_time(value):
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# Snapshot times covering the analysis period
+def _timestamps(args):
+    steps = int(round(args.hours * 60 / args.interval_minutes))
+    return [args.start + timedelta(minutes=i * args.interval_minutes) for i in range(steps + 1)]
+
+# Airport code, IATA and centre, from the command line or the airport metadata cache
+def _airport(args, headers):
+    if args.lat is not None and args.lon is not None:
+        return {'iata': args.iata or args.airport, 'lat': args.lat, 'lon': args.lon}
+    from .cache import MetadataCache
+    from .helpers import get_airport_details
+    with MetadataCache(os.path.join(args.cache_dir, 'airports.json'), ttl_days=365) as cache:
+        hit, details = cache.get(args.airport)
+        if not hit:
+            if getattr(args, 'offline', False):
+                raise SystemExit(f"{args.airport} is not in the airport cache; pass --lat/--lon or run once "
+                                 f"online to warm it")
+            details = get_airport_details(args.airport, headers)
+            cache.set(args.airport, details)
+    if not details:
+        raise SystemExit(f"Unknown airport {args.airport}")
+    return {'iata': args.iata or details.get('iata'), 'lat': details['lat'], 'lon': details['lon']}
+
+# Snapshot cache for the fetching subcommands
+def _snapshot_cache(args):
+    from .cache import SnapshotCache
+    return SnapshotCache(args.cache_dir, offline=getattr(args, 'offline', False))
+
+# (timestamp, flights) pairs of the period, streamed in batches or fetched in hybrid full/light mode
+def _fetch_snapshots(args, headers, timestamps=None):
+    from .helpers import TileMemory, get_hybrid_snapshots, plan_detection_filters, stream_snapshots
+    timestamps = _timestamps(args) if timestamps is None else list(timestamps)
+    only = getattr(args, 'only', None)
+    filters = plan_detection_filters(args.airport, arrivals=only != 'departures', departures=only != 'arrivals')
+    if args.tile:
+        filters['tiling'] = TileMemory()
+    if args.full_every:
+        flights_list, _ = get_hybrid_snapshots(timestamps, headers=headers, full_every=args.full_every,
+                                               cache=_snapshot_cache(args), max_workers=args.workers, **filters)
+        return zip(timestamps, flights_list)
+    return stream_snapshots(timestamps, headers=headers, batch_size=args.batch_size,
+                            cache=_snapshot_cache(args), max_workers=args.workers, **filters)
+
+
+def cmd_collect(args):
+    """Fetch the snapshots of a period into the cache (and optionally a long-format file)."""
+    from .helpers import snapshots_to_dataframe, with_datetimes, write_dataset
+    headers = _api_headers(args)
+    snapshots = list(_fetch_snapshots(args, headers))
+    print(f"Collected {len(snapshots)} snapshots, {sum(len(flights) for _, flights in snapshots)} positions")
+    if args.output or args.dataset:
+        df = snapshots_to_dataframe(snapshots)
+        if args.output:
+            with_datetimes(df).to_csv(args.output, index=False)
+            print(f"Wrote {len(df)} rows to {args.output}")
+        if args.dataset:
+            write_dataset(df, args.airport, root=args.dataset)
+            print(f"Wrote {len(df)} rows to {args.dataset}")
+    return 0
+
+
+def cmd_detect(args):
+    """Stream the snapshots of a period through IntervalStream and write the detections."""
+    import contextlib
+    import io
+    from .helpers import IntervalStream, read_chunked_detections, run_chunked, time_chunks, with_datetimes
+    headers = _api_headers(args) if not args.offline else {}
+    airport = _airport(args, headers)
+    stream = IntervalStream(airport['iata'], airport['lat'], airport['lon'], args.radius_km, args.interval_minutes,
+                            track_flights=not args.chunk_hours)  # Chunked runs do not report the flight count
+    quiet = contextlib.redirect_stdout(io.StringIO()) if not args.verbose else contextlib.nullcontext()
+    if args.chunk_hours:
+        # Long periods: one chunk in memory at a time, detections spilled under output_dir/chunks
+        chunk_dir = os.path.join(args.output_dir, 'chunks')
+        chunks = time_chunks(args.start, args.start + timedelta(hours=args.hours), args.interval_minutes,
+                             args.chunk_hours)
+        # Everything besides the stream settings that changes what a chunk holds
+        params = {'airport_code': args.airport, 'only': args.only, 'full_every': args.full_every,
+                  'tile': args.tile, 'chunk_hours': args.chunk_hours}
+        with quiet:
+            summary = run_chunked(stream, chunks, lambda times: _fetch_snapshots(args, headers, times), chunk_dir,
+                                  params=params)
+        intervals = summary['intervals']
+        arrivals = with_datetimes(read_chunked_detections(summary['run_dir'], summary['labels'], 'arrivals'))
+        departures = with_datetimes(read_chunked_detections(summary['run_dir'], summary['labels'], 'departures'))
+        print(f"{summary['chunks']} chunks processed, {summary['skipped']} already in {summary['run_dir']}")
+    else:
+        with quiet:
+            stream.run(_fetch_snapshots(args, headers))
+        intervals = stream.intervals
+        arrivals, departures = with_datetimes(stream.arrivals_df()), with_datetimes(stream.departures_df())
+    print(f"=== Arrivals and Departures at {args.airport}, {intervals} intervals ===")
+    if args.only != 'departures':
+        print(f"- Arrivals: {len(arrivals)} flights")
+    if args.only != 'arrivals':
+        print(f"- Departures: {len(departures)} flights")
+    if not args.chunk_hours:
+        print(f"- All associated flights: {len(stream.flight_ids)}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    # With --only, the other direction was detected from partial data; leave its file alone
+    written = []
+    for kind, df in (('arrivals', arrivals), ('departures', departures)):
+        if args.only in (None, kind):
+            df.to_csv(os.path.join(args.output_dir, f'all_{kind}_df.csv'), index=False)
+            written.append(f'all_{kind}_df.csv')
+    print(f"Wrote {' and '.join(written)} to {args.output_dir}")
+    return 0
+
+
+def cmd_compare(args):
+    """Run the reference-schedule comparison (fr24.compare)."""
+    from .compare import main
+    return main(args.compare_args, prog='fr24 compare')
+
+
+def cmd_report(args):
+    """Print the most common routes and operating airlines of a long-format flights file."""
+    from .helpers import airline_counts, apply_schema, get_airline_names, read_dataset, route_counts
+    import pandas as pd
+    if args.dataset:
+        df = read_dataset(args.dataset, columns=['fr24_id', 'Origin', 'Destination', 'operating_as'],
+                          airports=args.airport)
+    else:
+        df = pd.read_csv(args.flights, dtype={'fr24_id': str},
+                         usecols=['fr24_id', 'Origin', 'Destination', 'operating_as'])
+    df = apply_schema(df)
+    print("=== Most Common Routes ===")
+    print(route_counts(df, args.top).to_string(index=False))
+    airlines = airline_counts(df, args.top)
+    if args.airline_names:
+        from .cache import MetadataCache
+        with MetadataCache(os.path.join(args.cache_dir, 'airlines.json')) as cache:
+            names = get_airline_names(airlines['operating_as'].astype(str).tolist(), _api_headers(args), cache=cache)
+        airlines.insert(1, 'Airline_Name', airlines['operating_as'].astype(str).map(names))
+    print("\n=== Most Frequent Airlines ===")
+    print(airlines.to_string(index=False))
+    return 0
+
+
+def cmd_cache(args):
+    """Show, evict or clear the snapshot cache."""
+    from .cache import SnapshotCache
+    cache = SnapshotCache(args.cache_dir)
+    if args.action == 'clear':
+        cache.clear()
+        print(f"Cleared {args.cache_dir}")
+    elif args.action == 'evict':
+        cache.max_age_days = args.max_age_days
+        cache.max_bytes = int(args.max_mb * 2**20) if args.max_mb is not None else cache.max_bytes
+        cache.evict()
+    stats = cache.stats()
+    print(f"{args.cache_dir}: {stats['entries']} entries, {stats['total_bytes'] / 2**20:.1f} MB")
+    return 0
+
+
+def _add_period_arguments(parser):
+    parser.add_argument('airport', help="airport code used in the snapshot query (e.g. ARN)")
+    parser.add_argument('--start', type=_utc_time, required=True, help="period start, ISO 8601 (UTC if no offset)")
+    parser.add_argument('--hours', type=float, default=6)
+    parser.add_argument('--interval-minutes', type=float, default=30)
+    parser.add_argument('--batch-size', type=int, default=8, help="snapshots fetched (and held) at a time")
+    parser.add_argument('--workers', type=int, default=4, help="concurrent snapshot requests")
+    parser.add_argument('--full-every', type=int, metavar='N',
+                        help="hybrid mode: full snapshot every N samples, light endpoint in between")
+    parser.add_argument('--tile', action='store_true',
+                        help="split snapshots that hit the 1000-flight limit into bounds tiles")
+    parser.add_argument('--token', help=f"FR24 API token (default: ${TOKEN_ENV})")
+    parser.add_argument('--rate', type=float, default=2.0, help="API requests per second (halved after a 429)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='fr24', description="FR24 arrival/departure analysis.")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help="snapshot cache directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    collect = commands.add_parser('collect', help=cmd_collect.__doc__)
+    _add_period_arguments(collect)
+    collect.add_argument('--output', help="also write the long-format flights to this CSV")
+    collect.add_argument('--dataset', help="also append them to this Parquet dataset")
+    collect.set_defaults(func=cmd_collect)
+
+    detect = commands.add_parser('detect', help=cmd_detect.__doc__)
+    _add_period_arguments(detect)
+    detect.add_argument('--iata', help="IATA code matched against Origin/Destination (default: from airport details)")
+    detect.add_argument('--lat', type=float, help="airport latitude (skips the airport details lookup)")
+    detect.add_argument('--lon', type=float, help="airport longitude")
+    detect.add_argument('--radius-km', type=float, default=5)
+    detect.add_argument('--only', choices=['arrivals', 'departures'],
+                        help="detect and write one direction (arrivals fetch only inbound: flights)")
+    detect.add_argument('--chunk-hours', type=float,
+                        help="process long periods in chunks of this many hours, resuming finished chunks")
+    detect.add_argument('--offline', action='store_true', help="use cached snapshots only")
+    detect.add_argument('--output-dir', default='./Outputs')
+    detect.add_argument('--verbose', action='store_true', help="print per-interval messages")
+    detect.set_defaults(func=cmd_detect)
+
+    compare = commands.add_parser('compare', help=cmd_compare.__doc__, add_help=False)
+    compare.add_argument('compare_args', nargs=argparse.REMAINDER)
+    compare.set_defaults(func=cmd_compare)
+
+    report = commands.add_parser('report', help=cmd_report.__doc__)
+    source = report.add_mutually_exclusive_group(required=True)
+    source.add_argument('--flights', help="long-format flights CSV (e.g. Outputs/all_flights_df.csv)")
+    source.add_argument('--dataset', help="Parquet dataset written by collect --dataset")
+    report.add_argument('--airport', help="dataset partition to read")
+    report.add_argument('--top', type=int, default=10)
+    report.add_argument('--airline-names', action='store_true', help="look up airline names (uses the API)")
+    report.add_argument('--token', help=f"FR24 API token (default: ${TOKEN_ENV})")
+    report.add_argument('--rate', type=float, default=2.0, help="API requests per second (halved after a 429)")
+    report.set_defaults(func=cmd_report)
+
+    cache = commands.add_parser('cache', help=cmd_cache.__doc__)
+    cache.add_argument('action', nargs='?', choices=['stats', 'evict', 'clear'], default='stats')
+    cache.add_argument('--max-age-days', type=float, help="evict entries older than this")
+    cache.add_argument('--max-mb', type=float, help="evict least recently used entries beyond this size")
+    cache.set_defaults(func=cmd_cache)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'compare':
+        # Everything after the subcommand belongs to fr24.compare, including --help
+        args.compare_args = argv[argv.index('compare') + 1:]
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
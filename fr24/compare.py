@@ -0,0 +1,205 @@
+"""Compare FR24 detections against reference flight schedules.
+
+Replaces the one-off Outputs/data_comparison.py. Run from the case directory:
+    fr24 compare departures --reference Outputs/flight_departures.csv \
+        --detections Outputs/all_departures_df.csv --output Outputs/flight_comparison_departures.csv
+Add --date 2025-02-20 --tolerance-minutes 90 to pair flights by time as well as by code
+(the reference times are local times at the airport, see --timezone).
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+# Reference-side prefixes rewritten to the code FR24 reports (applied before '*' is stripped)
+DEFAULT_PREFIX_MAP = {
+    'D8*': 'D8',  # Norwegian Air Sweden, "D8* 2030" -> D82030
+    'APF': 'HP',  # PopulAir, "APF 281" -> HP281
+}
+
+# Per-kind column layout of the reference schedules and detections
+KINDS = {
+    'departures': {
+        'time': 'Departure Time', 'code': 'Destination Code', 'full': 'Destination Full',
+        'detected_code': 'Destination', 'reference_name': 'flight_departures', 'detections_name': 'all_departures_df',
+    },
+    'arrivals': {
+        'time': 'Arrival Time', 'code': 'Origin Code', 'full': 'Origin Full',
+        'detected_code': 'Origin', 'reference_name': 'flight_arrivals', 'detections_name': 'all_arrivals_df',
+    },
+}
+
+
+# Normalize flight codes for joining
+def normalize_flight_codes(codes, prefix_map=None):
+    """Vectorized flight-code normalization: upper-case, drop spaces, rewrite
+    the first matching prefix of prefix_map (longest first) and strip '*'.
+    Returns an object Series with None for missing codes."""
+    prefix_map = DEFAULT_PREFIX_MAP if prefix_map is None else prefix_map
+    codes = pd.Series(codes).astype('string').str.upper().str.replace(' ', '', regex=False)
+    normalized = codes.copy()
+    remaining = codes.notna()
+    for prefix in sorted(prefix_map, key=len, reverse=True):
+        key = prefix.replace(' ', '').upper()
+        match = remaining & codes.str.startswith(key).fillna(False)
+        normalized[match] = prefix_map[prefix] + codes[match].str.slice(len(key))
+        remaining &= ~match
+    normalized = normalized.str.replace('*', '', regex=False)
+    return normalized.astype(object).where(normalized.notna(), None)
+
+# Turn HH:MM local schedule times into UTC timestamps
+def schedule_times_utc(times, date, timezone='Europe/Stockholm'):
+    """Combine HH:MM strings with a date (scalar or per-row) in the airport's
+    local timezone and convert to UTC. Unparseable times become NaT."""
+    local = pd.to_datetime(pd.Series(date, index=times.index).astype(str) + ' ' + times.astype(str),
+                           errors='coerce', format='mixed')
+    return local.dt.tz_localize(timezone, ambiguous='NaT', nonexistent='shift_forward').dt.tz_convert('UTC')
+
+# Read detection times given as datetimes, ISO strings or unix seconds
+def _utc_times(values):
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return pd.to_datetime(values.astype('Float64'), unit='s', utc=True)
+    return pd.to_datetime(values, utc=True)
+
+# One row per detected flight with a join key and an event time
+def detection_events(detections, kind, prefix_map=None):
+    """Reduce wide-format detections (all_arrivals_df / all_departures_df) to
+    fr24_id, Flight_key, the other airport and Event_time: the interval midpoint,
+    or the one known end of the interval for flights seen in a single snapshot."""
+    column = KINDS[kind]['detected_code']
+    flight = detections['Flight_start'].where(detections['Flight_start'].notna(), detections['Flight_end'])
+    other = detections[f'{column}_end'].where(detections[f'{column}_end'].notna(), detections[f'{column}_start'])
+    start, end = _utc_times(detections['Timestamp_start']), _utc_times(detections['Timestamp_end'])
+    events = pd.DataFrame({
+        'fr24_id': detections['fr24_id'].to_numpy(),
+        'Flight_key': normalize_flight_codes(flight, prefix_map).to_numpy(),
+        'Detected_code': other.to_numpy(),
+        'Event_time': (start + (end - start) / 2).fillna(start).fillna(end).to_numpy(),
+    })
+    return events.dropna(subset=['Flight_key'])
+
+# Compare a reference schedule with FR24 detections
+def compare_flights(reference, detections, kind='departures', prefix_map=None, by=None,
+                    date=None, timezone='Europe/Stockholm', tolerance=None):
+    """Match reference flights to detections on the normalized flight code (and
+    any extra `by` columns present in both, e.g. airport or date).
+    Without tolerance, repeated codes are paired in order of occurrence with a
+    hash join. With a tolerance (Timedelta) the reference time on `date` (or a
+    'Date' column) is matched to the nearest detection of the same code within
+    tolerance using merge_asof. Returns the reference columns plus fr24_id,
+    Detected Time and Status, in the layout of flight_comparison_*.csv."""
+    spec = KINDS[kind]
+    by = list(by or [])
+    ref = reference.copy()
+    ref['Flight_key'] = normalize_flight_codes(ref['Flight'], prefix_map).to_numpy()
+    ref = ref.dropna(subset=['Flight_key'])
+    events = detection_events(detections, kind, prefix_map)
+    for column in by:
+        events[column] = detections.loc[events.index, column].to_numpy()
+    keys = ['Flight_key'] + by
+
+    if tolerance is None:
+        # Pair the n-th reference row of a code with its n-th detection
+        ref['_n'] = ref.groupby(keys, sort=False).cumcount()
+        events = events.sort_values('Event_time', kind='stable')
+        events['_n'] = events.groupby(keys, sort=False).cumcount()
+        merged = ref.merge(events, on=keys + ['_n'], how='outer', indicator=True).drop(columns='_n')
+    else:
+        dates = ref['Date'] if 'Date' in ref.columns else date
+        if dates is None:
+            raise ValueError("a date (or a 'Date' column) is required for time-tolerant matching")
+        ref['Reference_time'] = schedule_times_utc(ref[spec['time']], dates, timezone)
+        timed = ref.dropna(subset=['Reference_time']).sort_values('Reference_time')
+        events = events.dropna(subset=['Event_time']).sort_values('Event_time')
+        matched = pd.merge_asof(timed, events, left_on='Reference_time', right_on='Event_time', by=keys,
+                                tolerance=pd.Timedelta(tolerance), direction='nearest')
+        # A detection claimed by several reference rows stays with the closest one
+        ranked = matched.assign(_d=(matched['Event_time'] - matched['Reference_time']).abs())
+        ranked = ranked.sort_values('_d', kind='stable')
+        duplicate = (ranked['fr24_id'].notna() & ranked.duplicated('fr24_id')).reindex(matched.index)
+        matched.loc[duplicate, ['fr24_id', 'Detected_code', 'Event_time']] = None
+        unmatched = ref.loc[ref['Reference_time'].isna()]
+        extra = events.loc[~events['fr24_id'].isin(matched['fr24_id'])]
+        merged = pd.concat([
+            matched.assign(_merge=matched['fr24_id'].notna().map({True: 'both', False: 'left_only'})),
+            unmatched.assign(_merge='left_only'),
+            extra.assign(_merge='right_only'),
+        ], ignore_index=True).drop(columns='Reference_time')
+
+    status = merged['_merge'].astype(str).map({
+        'both': 'Common',
+        'left_only': f"Only in {spec['reference_name']}",
+        'right_only': f"Only in {spec['detections_name']}",
+    })
+    detected_only = merged['_merge'].astype(str) == 'right_only'
+    result = pd.DataFrame({'Flight': merged['Flight_key']})
+    for column in ['Departure Time', 'Arrival Time', spec['code'], 'Airline', spec['full']]:
+        values = merged[column] if column in merged.columns else pd.Series(None, index=merged.index, dtype=object)
+        result[column] = values.astype(object).where(~detected_only, 'N/A')
+    result.loc[detected_only, spec['code']] = merged.loc[detected_only, 'Detected_code'].fillna('N/A')
+    for column in by:
+        result[column] = merged[column]
+    result['fr24_id'] = merged['fr24_id']
+    result['Detected Time'] = merged['Event_time']
+    result['Status'] = status.to_numpy()
+    order = {'Common': 0, f"Only in {spec['reference_name']}": 1, f"Only in {spec['detections_name']}": 2}
+    return result.sort_values('Status', key=lambda s: s.map(order), kind='stable').reset_index(drop=True)
+
+# Count matches per status
+def comparison_summary(comparison):
+    """Status counts plus match rates against the reference and the detections."""
+    counts = comparison['Status'].value_counts()
+    common = int(counts.get('Common', 0))
+    only_reference = int(counts[counts.index.str.startswith('Only in flight_')].sum())
+    only_detections = int(counts[counts.index.str.startswith('Only in all_')].sum())
+    return {
+        'common': common,
+        'only_in_reference': only_reference,
+        'only_in_detections': only_detections,
+        'reference_match_rate': common / (common + only_reference) if common + only_reference else None,
+        'detection_match_rate': common / (common + only_detections) if common + only_detections else None,
+    }
+
+
+def _parse_prefix_map(items):
+    if not items:
+        return None
+    prefix_map = {}
+    for item in items:
+        prefix, sep, replacement = item.partition('=')
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--prefix expects PREFIX=REPLACEMENT, got {item!r}")
+        prefix_map[prefix] = replacement
+    return prefix_map
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Compare FR24 detections with a reference schedule.")
+    parser.add_argument('kind', choices=sorted(KINDS))
+    parser.add_argument('--reference', required=True, help="schedule CSV (e.g. Outputs/flight_departures.csv)")
+    parser.add_argument('--detections', required=True, help="detections CSV (e.g. Outputs/all_departures_df.csv)")
+    parser.add_argument('--output', help="write the comparison table to this CSV")
+    parser.add_argument('--prefix', action='append', metavar='PREFIX=CODE',
+                        help="prefix rewrite (repeatable); replaces the default D8*=D8, APF=HP table")
+    parser.add_argument('--by', action='append', help="extra join column present in both files (repeatable)")
+    parser.add_argument('--date', help="schedule date (YYYY-MM-DD) for time-tolerant matching")
+    parser.add_argument('--timezone', default='Europe/Stockholm', help="timezone of the schedule times")
+    parser.add_argument('--tolerance-minutes', type=float, help="match on time as well, within this many minutes")
+    args = parser.parse_args(argv)
+
+    reference = pd.read_csv(args.reference)
+    detections = pd.read_csv(args.detections, dtype={'fr24_id': str})
+    tolerance = pd.Timedelta(minutes=args.tolerance_minutes) if args.tolerance_minutes is not None else None
+    comparison = compare_flights(reference, detections, args.kind, _parse_prefix_map(args.prefix), args.by,
+                                 args.date, args.timezone, tolerance)
+
+    print(f"{args.kind.capitalize()} Comparison Table:")
+    print(comparison)
+    print(comparison_summary(comparison))
+    if args.output:
+        comparison.to_csv(args.output, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2365 @@
+import requests
+from requests.adapters import HTTPAdapter
+import json
+import hashlib
+import os
+import time
+import uuid
+import threading
+import random
+import re
+from contextlib import contextmanager
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .cache import CACHE_DIR, MetadataCache, SnapshotCache, SnapshotCacheMiss, _json_loads
+
+# Use SciPy's KD-tree for nearest-airport queries when it is installed
+try:
+    from scipy.spatial import cKDTree as _cKDTree
+except ImportError:
+    _cKDTree = None
+
+# Define the API base URL as a constant (FR24_API_BASE_URL points the pipeline at a stand-in server)
+API_BASE_URL = os.environ.get('FR24_API_BASE_URL', "https://fr24api.flightradar24.com/api")
+
+# Default location of partitioned Parquet output datasets
+DATASET_DIR = "./Outputs/datasets"
+
+# Price of one API credit in USD
+CREDIT_PRICE = 0.0003
+
+# Keys of a cost_info dict that add up across queries
+COST_KEYS = ('flights_returned', 'total_credits', 'total_cost')
+
+
+# Coerce scalars, arrays or Series to float64 with NaN for missing values
+def _as_float(values):
+    if np.ndim(values) == 0:
+        value = pd.to_numeric(values, errors='coerce')
+        return np.nan if pd.isna(value) else float(value)
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        return values.astype(np.float64, copy=False)
+    if not isinstance(values, pd.Series):
+        values = pd.Series(np.asarray(values, dtype=object))
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+
+# Haversine formula to calculate distance between two points
+def haversine(lat1, lon1, lat2, lon2):
+    """Calculate the great-circle distance between two points in kilometers.
+    Accepts scalars or NumPy arrays/Series (broadcast together) and returns a
+    float or ndarray; missing coordinates propagate as NaN."""
+    R = 6371.0  # Earth's radius in kilometers
+    lat1, lon1, lat2, lon2 = (np.radians(_as_float(v)) for v in (lat1, lon1, lat2, lon2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2)**2
+    a = np.clip(a, 0.0, 1.0)  # Guard against rounding just outside [0, 1]
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    distance = R * c
+    return float(distance) if np.ndim(distance) == 0 else distance
+
+# Counters, timings and events for a run
+class Metrics:
+    """Thread-safe registry of counters and timing summaries keyed by name and
+    labels, e.g. request latency per endpoint or pivot time per interval.
+    Hooks added with add_hook are called with an event dict for every timing
+    and explicit event, so profiling (or a JSON lines log via jsonl_hook) is
+    opt-in. Totals export with write_jsonl or to_prometheus."""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.counters = {}  # (name, labels) -> value
+        self.timings = {}  # (name, labels) -> [count, total seconds, max seconds]
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.timings.clear()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self.timings.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += seconds
+            summary[2] = max(summary[2], seconds)
+        if self.hooks:
+            self.event(name, seconds=seconds, **labels)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time a block and record it under name/labels."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def event(self, name, **fields):
+        """Pass an event to every hook (no-op without hooks)."""
+        if not self.enabled or not self.hooks:
+            return
+        record = dict(fields, name=name, time=time.time())
+        for hook in list(self.hooks):
+            hook(record)
+
+    def counter(self, name, **labels):
+        """Sum of a counter over every label set matching labels."""
+        with self._lock:
+            return sum(value for (key, key_labels), value in self.counters.items()
+                       if key == name and set(labels.items()) <= set(key_labels))
+
+    def summary(self):
+        """Headline totals: requests, credits, flights, detections and credits per detection."""
+        detections = self.counter('fr24_detections_total')
+        credits = self.counter('fr24_credits_total')
+        return {
+            'requests': self.counter('fr24_requests_total'),
+            'credits': credits,
+            'flights_returned': self.counter('fr24_flights_returned_total'),
+            'bytes_received': self.counter('fr24_response_bytes_total'),
+            'intervals': self.counter('fr24_intervals_total'),
+            'detections': detections,
+            'credits_per_detection': credits / detections if detections else None,
+        }
+
+    def records(self):
+        """Every series as a plain dict (the JSON lines schema)."""
+        with self._lock:
+            records = [{'name': name, 'labels': dict(labels), 'type': 'counter', 'value': value}
+                       for (name, labels), value in self.counters.items()]
+            records += [{'name': name, 'labels': dict(labels), 'type': 'summary',
+                         'count': count, 'sum': total, 'max': peak}
+                        for (name, labels), (count, total, peak) in self.timings.items()]
+        return records
+
+    def write_jsonl(self, path):
+        """Append the current totals to a JSON lines file, one series per line."""
+        now = time.time()
+        with open(path, 'a', encoding='utf-8') as f:
+            for record in self.records():
+                f.write(json.dumps(dict(record, time=now)) + '\n')
+
+    def to_prometheus(self):
+        """Render the registry in the Prometheus text exposition format."""
+        def labels_text(labels, **extra):
+            items = list(labels.items()) + list(extra.items())
+            if not items:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"') for _, v in items)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + '}'
+
+        lines, typed = [], set()
+        for record in sorted(self.records(), key=lambda r: (r['name'], sorted(r['labels'].items()))):
+            name, labels = record['name'], record['labels']
+            if name not in typed:
+                lines.append(f"# TYPE {name} {record['type']}")
+                typed.add(name)
+            if record['type'] == 'counter':
+                lines.append(f"{name}{labels_text(labels)} {record['value']}")
+            else:
+                lines.append(f"{name}_count{labels_text(labels)} {record['count']}")
+                lines.append(f"{name}_sum{labels_text(labels)} {record['sum']}")
+                lines.append(f"{name}{labels_text(labels, quantile='1')} {record['max']}")
+        return '\n'.join(lines) + '\n'
+
+# Hook that appends every metrics event to a JSON lines file
+def jsonl_hook(path):
+    lock = threading.Lock()
+
+    def hook(record):
+        line = json.dumps(record, default=str) + '\n'
+        with lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(line)
+    return hook
+
+# Registry used unless a client or stream is given its own
+METRICS = Metrics()
+
+# Collapse per-code path segments so endpoints aggregate under one label
+def _endpoint_label(endpoint):
+    return re.sub(r'^static/(airports|airlines)/[^/]+/', r'static/\1/{code}/', endpoint)
+
+# Token-bucket rate limiter shared by concurrent fetchers
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts
+    of up to `capacity`. backoff() halves the rate after a 429 and pauses for
+    Retry-After seconds; recover() ramps the rate back up after each success."""
+
+    def __init__(self, rate=2.0, capacity=None, min_rate=0.1, recovery_step=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.max_rate)
+        self.min_rate = min_rate
+        self.recovery_step = recovery_step if recovery_step is not None else self.max_rate / 10
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, retry_after=None):
+        """Multiplicatively reduce the rate, honouring a Retry-After delay if given."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def recover(self):
+        """Additively ramp the rate back towards its configured maximum."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
+
+# Parse a Retry-After header given in seconds
+def _retry_after_seconds(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+class FR24APIError(Exception):
+    """Raised when an FR24 API request fails after all retries."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Per-endpoint (connect, read) timeouts in seconds, keyed by the first path segment
+DEFAULT_TIMEOUTS = {
+    'static': (5, 15),
+    'live': (5, 30),
+    'historic': (5, 60),
+    'flight-tracks': (5, 30),
+}
+
+# HTTP status codes worth retrying
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# Pooled FR24 API client
+class FR24Client:
+    """FR24 API client owning a keep-alive requests.Session with a connection pool.
+    Transient failures (connection errors, timeouts, 429 and 5xx) are retried with
+    jittered exponential backoff; anything else raises FR24APIError.
+    Requests are paced by limiter, a TokenBucket (TokenBucket() by default)
+    shared by every call through the client, so the rate learned from 429
+    responses carries over between calls. An optional SnapshotCache serves
+    historic snapshots without touching the network. Latency, bytes,
+    retries, flights and credits are recorded in metrics (METRICS by default)."""
+
+    def __init__(self, headers, base_url=API_BASE_URL, pool_size=16, max_retries=4,
+                 backoff_base=0.5, backoff_max=30.0, timeouts=None, limiter=None, cache=None, metrics=None):
+        self.base_url = base_url.rstrip('/')
+        self.metrics = metrics if metrics is not None else METRICS
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.limiter = limiter if limiter is not None else TokenBucket()
+        self.cache = cache
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def _timeout(self, endpoint):
+        return self.timeouts.get(endpoint.split('/', 1)[0], (5, 30))
+
+    def _backoff(self, attempt):
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def request(self, endpoint, params=None, limiter=None):
+        """GET an endpoint (relative to base_url) and return the decoded JSON."""
+        limiter = limiter or self.limiter
+        url = f"{self.base_url}/{endpoint}"
+        label = _endpoint_label(endpoint)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.inc('fr24_retries_total', endpoint=label)
+            if limiter is not None:
+                limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, timeout=self._timeout(endpoint))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.inc('fr24_requests_total', endpoint=label, status='error')
+                if attempt == self.max_retries:
+                    raise FR24APIError(f"{endpoint} failed after {attempt + 1} attempts: {e}") from e
+                time.sleep(self._backoff(attempt))
+                continue
+
+            status = response.status_code
+            self.metrics.observe('fr24_request_seconds', time.perf_counter() - start, endpoint=label)
+            self.metrics.inc('fr24_requests_total', endpoint=label, status=str(status))
+            self.metrics.inc('fr24_response_bytes_total', len(response.content), endpoint=label)
+            if status in TRANSIENT_STATUS_CODES and attempt < self.max_retries:
+                retry_after = _retry_after_seconds(response)
+                if status == 429 and limiter is not None:
+                    limiter.backoff(retry_after)  # The limiter holds back every worker
+                else:
+                    time.sleep(retry_after if retry_after is not None else self._backoff(attempt))
+                continue
+            if not response.ok:
+                raise FR24APIError(f"{endpoint} returned HTTP {status}: {response.text[:200]}", status)
+            if limiter is not None:
+                limiter.recover()
+            return _json_loads(response.content)
+
+    def airport_details(self, airport_code):
+        """Airport details. Cost: 50 credits per query."""
+        data = self.request(f"static/airports/{airport_code}/full")
+        self.metrics.inc('fr24_credits_total', 50, endpoint='static/airports/{code}/full')
+        return data
+
+    def airline_info(self, icao_code):
+        """Airline name and codes, or None if the ICAO code is unknown. Cost: 1 credit per query."""
+        try:
+            data = self.request(f"static/airlines/{icao_code}/light")
+            self.metrics.inc('fr24_credits_total', 1, endpoint='static/airlines/{code}/light')
+            return data
+        except FR24APIError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+    def snapshot(self, params, cache=None, limiter=None, light=False):
+        """Historic flight positions for prepared snapshot params.
+        Returns (flights, cost_info). Cost: 8 credits per returned flight, or
+        6 from the light endpoint (positions only, see LIGHT_FIELDS)."""
+        endpoint = "historic/flight-positions/light" if light else "historic/flight-positions/full"
+        cache = cache if cache is not None else self.cache
+
+        # Historic snapshots never change, so a cached response is always valid
+        if cache is not None:
+            cached = cache.get(endpoint, params)
+            if cached is not None:
+                self.metrics.inc('fr24_cache_hits_total', endpoint=endpoint)
+                return cached, {'flights_returned': len(cached), 'total_credits': 0, 'total_cost': 0, 'cached': True}
+
+        data = self.request(endpoint, params, limiter=limiter)
+
+        # Handle both list and dict responses
+        if isinstance(data, list):
+            flights = data  # Direct list of flights
+        elif isinstance(data, dict):
+            flights = data.get('data', [])  # Extract 'data' key if dict
+        else:
+            flights = []  # Unexpected format, return empty list
+
+        credits_per_flight = 6 if light else 8
+        total_flights = len(flights)
+        total_credits = total_flights * credits_per_flight
+        cost_info = {
+            'flights_returned': total_flights,
+            'total_credits': total_credits,
+            'total_cost': total_credits * CREDIT_PRICE,
+            'cached': False
+        }
+        self.metrics.inc('fr24_flights_returned_total', total_flights, endpoint=endpoint)
+        self.metrics.inc('fr24_credits_total', total_credits, endpoint=endpoint)
+        if cache is not None:
+            cache.put(endpoint, params, flights)
+        return flights, cost_info
+
+    def live_positions(self, params, limiter=None):
+        """Current flight positions for prepared query params (never cached).
+        Returns (flights, cost_info). Cost: 8 credits per returned flight."""
+        endpoint = "live/flight-positions/full"
+        data = self.request(endpoint, params, limiter=limiter)
+        flights = data.get('data', []) if isinstance(data, dict) else (data if isinstance(data, list) else [])
+        total_credits = len(flights) * 8
+        self.metrics.inc('fr24_flights_returned_total', len(flights), endpoint=endpoint)
+        self.metrics.inc('fr24_credits_total', total_credits, endpoint=endpoint)
+        return flights, {
+            'flights_returned': len(flights),
+            'total_credits': total_credits,
+            'total_cost': total_credits * CREDIT_PRICE,
+            'cached': False
+        }
+
+    def flight_tracks(self, flight_id, cache=None, limiter=None):
+        """Track points of one flight, [] if the API does not know the id.
+        Returns (points, cost_info). Cost: 40 credits per found flight."""
+        endpoint = "flight-tracks"
+        params = {'flight_id': flight_id}
+        cache = cache if cache is not None else self.cache
+        if cache is not None:
+            cached = cache.get(endpoint, params)
+            if cached is not None:
+                self.metrics.inc('fr24_cache_hits_total', endpoint=endpoint)
+                return cached, {'flights_returned': 1 if cached else 0, 'total_credits': 0, 'total_cost': 0, 'cached': True}
+
+        try:
+            data = self.request(endpoint, params, limiter=limiter)
+        except FR24APIError as e:
+            if e.status_code != 404:
+                raise
+            data = []
+        # The response is a list of {fr24_id, tracks} objects
+        points = []
+        for flight in data if isinstance(data, list) else [data]:
+            if isinstance(flight, dict) and flight.get('fr24_id', flight_id) == flight_id:
+                points.extend(flight.get('tracks') or [])
+
+        found = bool(data)
+        total_credits = 40 if found else 0
+        cost_info = {
+            'flights_returned': int(found),
+            'total_credits': total_credits,
+            'total_cost': total_credits * CREDIT_PRICE,
+            'cached': False
+        }
+        self.metrics.inc('fr24_credits_total', total_credits, endpoint=endpoint)
+        if cache is not None:
+            cache.put(endpoint, params, points)
+        return points, cost_info
+
+
+# Shared clients so repeated helper calls reuse pooled connections
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(headers, rate=None):
+    """Return the shared FR24Client for a set of request headers.
+    rate (requests per second) replaces its limiter when it differs from the current one."""
+    key = tuple(sorted(headers.items()))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = FR24Client(headers, limiter=TokenBucket(rate) if rate else None)
+        client = _clients[key]
+        if rate and client.limiter.max_rate != rate:
+            client.limiter = TokenBucket(rate)
+        return client
+
+# Fetch airport details
+def get_airport_details(airport_code, headers, client=None):
+    """Fetch detailed airport info from FR24 API.
+    Cost: 50 credits per query ($0.015)
+    Endpoint: /api/static/airports/{code}/full"""
+    client = client or get_client(headers)
+    data = client.airport_details(airport_code)
+    credits = 50
+    total_cost = credits * CREDIT_PRICE
+    print(f"get_airport_details() API Cost: ${total_cost:.4f} ({credits} credits)")
+    return data
+
+# Get airline info using Airlines Light API
+def get_airline_info(icao_code, headers, client=None, cache=None):
+    """Fetch airline information from FR24 API.
+    Cost: 1 credit per query ($0.0003), 0 when served from a MetadataCache
+    Misses are only added to the cache in memory; save it once after the lookups.
+    Endpoint: /api/static/airlines/{icao}/light"""
+    if not icao_code:
+        return None
+    if cache is not None:
+        hit, data = cache.get(icao_code)
+        if hit:
+            return data
+    client = client or get_client(headers)
+    data = client.airline_info(icao_code)
+    if cache is not None:
+        cache.set(icao_code, data)
+    return data
+
+# Fetch airline info for many ICAO codes at once
+def prefetch_airline_info(icao_codes, headers, cache=None, client=None, max_workers=8):
+    """Look up every distinct ICAO code (e.g. a dataset's operating_as column)
+    concurrently, skipping codes already fresh in the cache. Unknown airlines
+    are cached as None. Returns {icao: info or None}.
+    Cost: 1 credit per code not already cached"""
+    codes = sorted({code for code in icao_codes if isinstance(code, str) and code})
+    results, missing = {}, []
+    for code in codes:
+        hit, data = cache.get(code) if cache is not None else (False, None)
+        if hit:
+            results[code] = data
+        else:
+            missing.append(code)
+
+    if missing:
+        client = client or get_client(headers)
+        errors = []
+
+        def fetch(code):
+            try:
+                return code, client.airline_info(code), True
+            except FR24APIError as e:
+                errors.append(e)
+                return code, None, False
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            fetched = list(pool.map(fetch, missing))
+        for code, data, ok in fetched:
+            results[code] = data
+            # Failed lookups are not cached so they are retried next time
+            if ok and cache is not None:
+                cache.set(code, data)
+        if cache is not None:
+            cache.save()
+        if errors:
+            raise errors[0]
+    return results
+
+# Map ICAO codes to airline names
+def get_airline_names(icao_codes, headers, cache=None, client=None, max_workers=8):
+    """Return {icao: airline name}, with 'Unknown' for airlines the API does not know."""
+    infos = prefetch_airline_info(icao_codes, headers, cache=cache, client=client, max_workers=max_workers)
+    return {code: (info or {}).get('name', 'Unknown') for code, info in infos.items()}
+
+# Fetch flight snapshot
+def get_snapshot(timestamp, airport_code, headers, limit=1000, bounds=None, gspeed=None, altitude_ranges=None, categories='P,C,M,J,T', cache=None, client=None, light=False):
+    """Fetch flight data at a specific timestamp.
+    Cost: 8 credits per returned flight ($0.0024 per flight), 6 with light=True, 0 when served from cache
+    Max cost with limit=1000: $2.40 per call
+    Endpoint: /api/historic/flight-positions/full (or /light)"""
+    client = client or get_client(headers)
+    params = _snapshot_params(timestamp, airport_code, limit, bounds, gspeed, altitude_ranges, categories)
+    return client.snapshot(params, cache=cache, light=light)
+
+# Build and validate query params for a snapshot request
+def _snapshot_params(timestamp, airport_code, limit=1000, bounds=None, gspeed=None, altitude_ranges=None, categories='P,C,M,J,T'):
+    # Several airports share one query through the comma-separated airports filter;
+    # codes without a direction (inbound:/outbound:/both:) match both directions
+    codes = [airport_code] if isinstance(airport_code, str) else list(airport_code)
+    params = {
+        'timestamp': timestamp,
+        'airports': ','.join(code if ':' in code else f'both:{code}' for code in codes),
+        'limit': limit,
+        'categories': categories,
+    }
+    if altitude_ranges:
+        if isinstance(altitude_ranges, str):
+            params['altitude_ranges'] = altitude_ranges
+        else:
+            raise ValueError("altitude_ranges must be a string")
+    if gspeed:
+        if isinstance(gspeed, str):
+            params['gspeed'] = gspeed
+        else:
+            raise ValueError("gspeed must be a string")
+        
+    if bounds:
+        if isinstance(bounds, str):
+            params['bounds'] = bounds
+        else:
+            raise ValueError("bounds must be a string")
+    return params
+
+# Parse a "north,south,west,east" bounds string
+def _parse_bounds(bounds):
+    north, south, west, east = (float(value) for value in bounds.split(','))
+    return north, south, west, east
+
+# Add the summable fields of one query's cost_info to a running total
+def _add_costs(total, cost):
+    for key in COST_KEYS:
+        total[key] += cost[key]
+    return total
+
+# Convert a datetime or unix timestamp to integer unix seconds
+def _unix_seconds(ts):
+    return int(ts.timestamp()) if hasattr(ts, 'timestamp') else int(ts)
+
+# Fetch many flight snapshots concurrently
+def get_snapshots(timestamps, airport_code, headers, limiter=None, max_workers=4, cache=None, client=None,
+                  light=False, tiling=None, **filters):
+    """Fetch snapshots for several timestamps concurrently, bounded by a TokenBucket.
+    Timestamps may be datetimes or unix seconds; results are returned in input order.
+    429 responses slow the limiter down and are retried by the client.
+    With a TileMemory as tiling, each snapshot goes through get_tiled_snapshot
+    so responses that hit the limit are split instead of truncated; without
+    one, truncated responses are reported.
+    Returns (list of flight lists, aggregated cost_info).
+    Endpoint: /api/historic/flight-positions/full (or /light)"""
+    client = client or get_client(headers)
+    limiter = limiter or client.limiter
+
+    def fetch(ts):
+        if tiling is not None:
+            return get_tiled_snapshot(ts, airport_code, headers, tiling=tiling, cache=cache, client=client,
+                                      limiter=limiter, max_workers=max_workers, light=light, **filters)
+        params = _snapshot_params(_unix_seconds(ts), airport_code, **filters)
+        flights, cost = client.snapshot(params, cache=cache, limiter=limiter, light=light)
+        if len(flights) >= params['limit']:
+            print(f"Warning: snapshot at {params['timestamp']} returned {len(flights)} flights, the limit; "
+                  f"results may be truncated (pass tiling=TileMemory() to split the query)")
+        return flights, cost
+
+    timestamps = list(timestamps)
+    # The first snapshot finds the tiling alone, so the others start from it rather than all splitting at once
+    results = [fetch(timestamps[0])] if tiling is not None and timestamps else []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results.extend(pool.map(fetch, timestamps[len(results):]))
+
+    cost_info = {key: sum(cost[key] for _, cost in results) for key in COST_KEYS}
+    cost_info['cached_snapshots'] = sum(1 for _, cost in results if cost.get('cached'))
+    return [flights for flights, _ in results], cost_info
+
+# get_snapshots keyword arguments that are fetch options rather than query filters
+FETCH_OPTIONS = ('limiter', 'max_workers', 'cache', 'client', 'light', 'tiling')
+
+# Root tile for queries without bounds
+WORLD_BOUNDS = "90.000,-90.000,-180.000,180.000"
+
+# Smallest tile edge that is still split (degrees; the API reads 3 decimals)
+MIN_TILE_DEGREES = 0.002
+
+# Split a bounds string into quadrants on the API's 3-decimal grid
+def _split_bounds(bounds):
+    north, south, west, east = _parse_bounds(bounds)
+    if north - south < MIN_TILE_DEGREES and east - west < MIN_TILE_DEGREES:
+        return []
+    lat_mid = round((north + south) / 2, 3) if north - south >= MIN_TILE_DEGREES else None
+    lon_mid = round((west + east) / 2, 3) if east - west >= MIN_TILE_DEGREES else None
+    lat_bands = [(north, lat_mid), (lat_mid, south)] if lat_mid is not None else [(north, south)]
+    lon_bands = [(west, lon_mid), (lon_mid, east)] if lon_mid is not None else [(west, east)]
+    # Edges are inclusive, so flights on a shared edge come back twice and are deduplicated
+    return [f"{n:.3f},{s:.3f},{w:.3f},{e:.3f}" for n, s in lat_bands for w, e in lon_bands]
+
+# Tilings found for snapshot queries, reused across timestamps
+class TileMemory:
+    """Bounds tiles per query region (all snapshot params except the
+    timestamp), as found by get_tiled_snapshot. Later timestamps of the same
+    region start from the remembered tiles, so the split is discovered (and
+    the truncated responses paid for) once per region rather than per
+    snapshot. Tiles are only ever split further, never merged back."""
+
+    def __init__(self):
+        self.tilings = {}  # region key -> list of bounds strings
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def region(params):
+        return tuple(sorted((key, str(value)) for key, value in params.items() if key != 'timestamp'))
+
+    def get(self, params):
+        with self._lock:
+            return list(self.tilings.get(self.region(params), []))
+
+    def set(self, params, tiles):
+        with self._lock:
+            self.tilings[self.region(params)] = list(tiles)
+
+# Fetch one snapshot, splitting saturated responses into tiles
+def get_tiled_snapshot(timestamp, airport_code, headers, limit=1000, bounds=None, tiling=None, cache=None,
+                       client=None, limiter=None, max_workers=4, light=False, **filters):
+    """Fetch a snapshot whose responses may hit limit. A response with limit
+    flights may be truncated, so its bounds (the whole world when the query
+    has none) are split into quadrants that are fetched concurrently, level
+    by level, until no tile is saturated or tiles reach MIN_TILE_DEGREES.
+    Flights are merged and deduplicated by fr24_id. The final tiles are
+    stored in tiling (a TileMemory) for later timestamps of the same query.
+    Cost: 8 (or 6 light) credits per returned flight, including the flights
+    of saturated responses that had to be split and of shared tile edges.
+    Returns (flights, cost_info with the number of tile queries)."""
+    client = client or get_client(headers)
+    limiter = limiter or client.limiter
+    base = _snapshot_params(_unix_seconds(timestamp), airport_code, limit, bounds, **filters)
+    pending = tiling.get(base) if tiling is not None else []
+    pending = pending or [bounds]
+    tiles, results = [], {}
+    cost_info = {'flights_returned': 0, 'total_credits': 0, 'total_cost': 0, 'cached': True, 'queries': 0,
+                 'saturated': 0}
+
+    def fetch(tile):
+        params = dict(base, bounds=tile) if tile else base
+        return client.snapshot(params, cache=cache, limiter=limiter, light=light)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending:
+            next_level = []
+            for tile, (flights, cost) in zip(pending, pool.map(fetch, pending)):
+                _add_costs(cost_info, cost)
+                cost_info['cached'] = cost_info['cached'] and bool(cost.get('cached'))
+                cost_info['queries'] += 1
+                children = _split_bounds(tile or WORLD_BOUNDS) if len(flights) >= limit else None
+                if children:
+                    cost_info['saturated'] += 1
+                    client.metrics.inc('fr24_saturated_responses_total')
+                    next_level.extend(children)
+                    continue
+                if children is not None:
+                    print(f"Warning: tile {tile} at {base['timestamp']} still returns {len(flights)} flights "
+                          f"at the smallest tile size; results may be truncated")
+                tiles.append(tile)
+                for flight in flights:
+                    results.setdefault(flight.get('fr24_id') or id(flight), flight)
+            pending = next_level
+
+    if tiling is not None and tiles != [bounds]:
+        tiling.set(base, tiles)
+    return list(results.values()), cost_info
+
+# Fields the light endpoints return
+LIGHT_FIELDS = ('fr24_id', 'hex', 'callsign', 'lat', 'lon', 'track', 'alt', 'gspeed', 'vspeed', 'squawk',
+                'timestamp', 'source')
+
+# Full-record fields carried over to light samples of the same flight
+FULL_ONLY_FIELDS = ('flight', 'type', 'reg', 'painted_as', 'operating_as', 'orig_iata', 'orig_icao',
+                    'dest_iata', 'dest_icao', 'eta')
+
+# Fetch full records for a few flights of one snapshot by callsign
+def _full_records(client, timestamp, airport_code, flights, cache, limiter, callsigns_per_query, filters):
+    wanted = {flight['fr24_id'] for flight in flights}
+    callsigns = sorted({flight['callsign'] for flight in flights})
+    records, cost_info = {}, {'flights_returned': 0, 'total_credits': 0, 'total_cost': 0, 'queries': 0}
+    for i in range(0, len(callsigns), callsigns_per_query):
+        params = _snapshot_params(_unix_seconds(timestamp), airport_code, **filters)
+        params['callsigns'] = ','.join(callsigns[i:i + callsigns_per_query])
+        found, cost = client.snapshot(params, cache=cache, limiter=limiter)
+        records.update((flight['fr24_id'], flight) for flight in found if flight.get('fr24_id') in wanted)
+        _add_costs(cost_info, cost)
+        cost_info['queries'] += 1
+    return records, cost_info
+
+# Fetch snapshots with the full endpoint at boundaries and the light one in between
+def get_hybrid_snapshots(timestamps, airport_code, headers, full_every=6, limiter=None, max_workers=4, cache=None,
+                         client=None, callsigns_per_query=15, tiling=None, **filters):
+    """Fetch every full_every-th timestamp (and the first and last) from
+    /historic/flight-positions/full and the rest from the 6-credit /light
+    endpoint, then give each light record the FULL_ONLY_FIELDS of the latest
+    full record of its fr24_id. With full_every=6 (e.g. 5-minute samples and
+    30-minute interval boundaries) a synthetic ARN day costs about 18% fewer
+    credits than fetching everything in full; 25% is the limit. Flights that first appear in a light sample
+    get their full record from a callsign-filtered full query at that time,
+    so only the new flights pay 8 credits; when a new flight has no callsign
+    the whole snapshot is fetched in full instead.
+    Returns (list of flight lists in full-record format, in input order,
+    aggregated cost_info with full/light/metadata query counts)."""
+    client = client or get_client(headers)
+    limiter = limiter or client.limiter
+    timestamps = list(timestamps)
+    last = len(timestamps) - 1
+    full = [i for i in range(len(timestamps)) if i % full_every == 0 or i == last]
+    light = [i for i in range(len(timestamps)) if i % full_every != 0 and i != last]
+    is_light = set(light)
+    common = dict(limiter=limiter, max_workers=max_workers, cache=cache, client=client, tiling=tiling)
+    full_flights, full_cost = get_snapshots([timestamps[i] for i in full], airport_code, headers, **common, **filters)
+    light_flights, light_cost = get_snapshots([timestamps[i] for i in light], airport_code, headers, light=True,
+                                              **common, **filters)
+    snapshots = dict(zip(full, full_flights))
+    snapshots.update(zip(light, light_flights))
+    cost_info = _add_costs({key: full_cost[key] for key in COST_KEYS}, light_cost)
+    cost_info.update(full_snapshots=len(full), light_snapshots=len(light), metadata_queries=0)
+
+    # Flights first seen in a light sample, assuming every earlier flight's record is known by then
+    known, missing = set(), {}
+    for i in range(len(timestamps)):
+        new = [flight for flight in snapshots[i] if flight.get('fr24_id') not in known]
+        known.update(flight.get('fr24_id') for flight in snapshots[i])
+        if i in is_light and new:
+            missing[i] = new
+    refetched = [i for i, new in missing.items() if any(not flight.get('callsign') for flight in new)]
+    lookups = [i for i in missing if i not in refetched]
+
+    def fetch_records(i):
+        return _full_records(client, timestamps[i], airport_code, missing[i], cache, limiter,
+                             callsigns_per_query, filters)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        fetched = list(pool.map(fetch_records, lookups))
+    found = {i: records for i, (records, _) in zip(lookups, fetched)}
+    costs = [cost for _, cost in fetched]
+    if refetched:
+        flights_list, refetch_cost = get_snapshots([timestamps[i] for i in refetched], airport_code, headers,
+                                                   **common, **filters)
+        snapshots.update(zip(refetched, flights_list))
+        costs.append(dict(refetch_cost, queries=len(refetched)))
+    for cost in costs:
+        _add_costs(cost_info, cost)
+        cost_info['metadata_queries'] += cost['queries']
+
+    # Walk forward, joining each light record to the latest full record of its flight
+    full_at = set(full) | set(refetched)
+    records, results = {}, []
+    for i in range(len(timestamps)):
+        if i in full_at:
+            flights = snapshots[i]
+            records.update((flight['fr24_id'], flight) for flight in flights if flight.get('fr24_id'))
+        else:
+            records.update(found.get(i, {}))
+            flights = []
+            for flight in snapshots[i]:
+                record = records.get(flight.get('fr24_id'))
+                merged = {field: record.get(field) for field in FULL_ONLY_FIELDS} if record else {}
+                merged.update((key, value) for key, value in flight.items() if value is not None)
+                flights.append(merged)
+        results.append(flights)
+    print(f"get_hybrid_snapshots() API Cost: ${cost_info['total_cost']:.4f} ({cost_info['total_credits']} credits, "
+          f"{len(full_at)} full / {len(timestamps) - len(full_at)} light snapshots)")
+    return results, cost_info
+
+# Thin out track points
+def decimate_track(points, min_seconds=None, max_points=None):
+    """Keep points at least min_seconds apart, then at most max_points evenly
+    spaced ones. The first and last points are always kept."""
+    if len(points) <= 2:
+        return list(points)
+    kept = list(points)
+    if min_seconds:
+        times = pd.to_datetime([p.get('timestamp') for p in kept], utc=True, errors='coerce')
+        seconds = (times - times[0]).total_seconds().to_numpy()
+        keep, last = [0], seconds[0]
+        for i in range(1, len(kept) - 1):
+            if not seconds[i] - last < min_seconds:  # NaT times are kept
+                keep.append(i)
+                last = seconds[i]
+        keep.append(len(kept) - 1)
+        kept = [kept[i] for i in keep]
+    if max_points and len(kept) > max_points:
+        index = np.unique(np.linspace(0, len(kept) - 1, max(max_points, 2)).round().astype(int))
+        kept = [kept[i] for i in index]
+    return kept
+
+# Fetch flight tracks for selected flights
+def get_flight_tracks(flight_ids, headers, limiter=None, max_workers=4, cache=None, client=None,
+                      min_seconds=None, max_points=None):
+    """Fetch /flight-tracks concurrently for distinct fr24_ids, caching each
+    flight's points under its id in a SnapshotCache (tracks of completed
+    flights never change). Points can be decimated with min_seconds/max_points;
+    the cache keeps the full track.
+    Returns ({fr24_id: points}, aggregated cost_info).
+    Cost: 40 credits per flight ($0.012), 0 when served from cache
+    Endpoint: /api/flight-tracks"""
+    client = client or get_client(headers)
+    limiter = limiter or client.limiter
+    flight_ids = list(dict.fromkeys(fid for fid in flight_ids if fid))
+
+    def fetch(flight_id):
+        return client.flight_tracks(flight_id, cache=cache, limiter=limiter)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(fetch, flight_ids))
+
+    tracks = {
+        flight_id: decimate_track(points, min_seconds, max_points)
+        for flight_id, (points, _) in zip(flight_ids, results)
+    }
+    cost_info = {key: sum(cost[key] for _, cost in results) for key in COST_KEYS}
+    cost_info['cached_tracks'] = sum(1 for _, cost in results if cost.get('cached'))
+    print(f"get_flight_tracks() API Cost: ${cost_info['total_cost']:.4f} ({cost_info['total_credits']} credits)")
+    return tracks, cost_info
+
+# Track point field -> long-format column
+TRACK_COLUMNS = {
+    'Timestamp': 'timestamp', 'Lat': 'lat', 'Lon': 'lon', 'Altitude': 'alt', 'Ground_Speed': 'gspeed',
+    'Vertical_Speed': 'vspeed', 'Track': 'track', 'Squawk': 'squawk', 'Callsign': 'callsign', 'Source': 'source',
+}
+
+# Convert fetched tracks into a long-format dataframe
+def tracks_to_dataframe(tracks):
+    """One row per track point with the column names and dtypes used for snapshots."""
+    rows = [
+        dict({'fr24_id': flight_id}, **{column: point.get(field) for column, field in TRACK_COLUMNS.items()})
+        for flight_id, points in tracks.items() for point in points
+    ]
+    df = pd.DataFrame(rows, columns=['fr24_id'] + list(TRACK_COLUMNS))
+    return apply_schema(df)
+
+# Get airport coordinates
+def calculate_bounds(lat, lon, radius_km=5):
+    """Calculate bounding box around airport given a radius in km."""
+    # Approximate conversions
+    lat_degree = radius_km / 111.0  # 1° lat ~ 111 km
+    lon_degree = radius_km / (111.0 * abs(np.cos(np.radians(lat))))  # Adjust for latitude
+
+    north = lat + lat_degree
+    south = lat - lat_degree
+    west = lon - lon_degree
+    east = lon + lon_degree
+
+    return f"{north:.3f},{south:.3f},{west:.3f},{east:.3f}"
+
+
+# Upper end of gspeed ranges when the local rules set no maximum (knots)
+MAX_GSPEED_KTS = 9999
+
+# Bounds string containing a whole circle, rounded outwards to the 3 decimals the API reads
+def _covering_bounds(lat, lon, radius_km):
+    angle = radius_km / 6371.0  # Same earth radius as haversine
+    lat_delta = np.degrees(angle)
+    ratio = np.sin(angle) / max(np.cos(np.radians(lat)), 1e-9)
+    lon_delta = 180.0 if ratio >= 1 else np.degrees(np.arcsin(ratio))
+    north = min(np.ceil((lat + lat_delta) * 1000) / 1000, 90.0)
+    south = max(np.floor((lat - lat_delta) * 1000) / 1000, -90.0)
+    west = max(np.floor((lon - lon_delta) * 1000) / 1000, -180.0)
+    east = min(np.ceil((lon + lon_delta) * 1000) / 1000, 180.0)
+    return f"{north:.3f},{south:.3f},{west:.3f},{east:.3f}"
+
+# Server-side filters for arrival/departure detection
+def plan_detection_filters(airport_code, arrivals=True, departures=True, categories='P,C,M,J,T'):
+    """Return get_snapshot/get_snapshots keyword arguments for the detections
+    wanted. An arrival needs its destination to match at the start of the
+    interval, so arrivals alone use inbound:<code>; detections then differ
+    from both:<code> only for a flight whose destination is lost or changed
+    by the end snapshot while its origin still matches. Departures keep
+    both:<code>, since clean_data_departures also accepts a null origin,
+    which outbound: would drop. Position, altitude and speed rules are not
+    pushed down: they are judged per interval, and a flight missing from a
+    snapshot counts as a possible arrival (Altitude_end NA) or departure
+    (Altitude_start NA), so a filtered-out record could add detections. For
+    the same reason no bounds are set."""
+    if not (arrivals or departures):
+        raise ValueError("plan at least one of arrivals/departures")
+    direction = 'inbound' if arrivals and not departures else 'both'
+    codes = [airport_code] if isinstance(airport_code, str) else list(airport_code)
+    return {'airport_code': [f"{direction}:{code}" for code in codes], 'categories': categories}
+
+# Server-side filters for ground-roll (runway) analysis
+def plan_ground_roll_filters(airport_code, max_altitude=10, min_speed=25, max_speed=None, center_lat=None,
+                             center_lon=None, radius_km=None, min_altitude=0, categories='P,C,M,J,T'):
+    """Return get_snapshot/get_snapshots keyword arguments for the per-point
+    rule of runway_paths/assign_runways (Altitude <= max_altitude and
+    Ground_Speed > min_speed, both required). Each point is judged on its own
+    there, so dropping points that fail it server-side cannot change the
+    result: altitude_ranges is min_altitude-max_altitude (the API reports
+    ground positions at 0 ft, not below) and gspeed starts at the first whole
+    knot above min_speed. Bounds covering the radius_km circle are added when
+    a centre and radius are given, for analyses that also drop points
+    outside that circle; they are rounded outwards, since the API only reads
+    3 decimals."""
+    codes = [airport_code] if isinstance(airport_code, str) else list(airport_code)
+    plan = {
+        'airport_code': codes,
+        'categories': categories,
+        'altitude_ranges': f"{int(np.floor(min_altitude))}-{int(np.floor(max_altitude))}",
+        'gspeed': f"{int(np.floor(min_speed)) + 1}-{int(np.floor(max_speed)) if max_speed is not None else MAX_GSPEED_KTS}",
+    }
+    if radius_km is not None and center_lat is not None and center_lon is not None:
+        plan['bounds'] = _covering_bounds(center_lat, center_lon, radius_km)
+    return plan
+
+# Check if flight is within a circular area
+def is_flight_in_circle(flight_lat, flight_lon, center_lat, center_lon, radius_km):
+    """Check if a flight is within the specified circular area."""
+    distance = haversine(flight_lat, flight_lon, center_lat, center_lon)
+    return distance <= radius_km
+
+# Flag positions inside a circle, leaving missing positions as <NA>
+def _circle_flags(lat, lon, center_lat, center_lon, radius_km):
+    distance = haversine(lat, lon, center_lat, center_lon)
+    flags = pd.array(distance <= radius_km, dtype='boolean')
+    flags[np.isnan(distance)] = pd.NA
+    return flags
+
+# Unit-sphere (x, y, z) coordinates for lat/lon in degrees
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(_as_float(lat)), np.radians(_as_float(lon))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+# Spatial index over airport reference points and geofence radii
+class AirportIndex:
+    """Bulk airport lookups for many positions.
+    `airports` maps code -> (lat, lon, radius_km) or an airport details dict
+    with 'lat'/'lon' (and optionally 'radius_km'). Geofences are bucketed into
+    a uniform lat/lon grid of cell_deg cells, so containment only runs haversine
+    against airports registered in a position's cell. Nearest-airport queries
+    use a KD-tree on unit-sphere coordinates when SciPy is installed and a
+    chunked dot-product search otherwise."""
+
+    def __init__(self, airports, cell_deg=1.0, default_radius_km=5):
+        self.cell_deg = cell_deg
+        self.codes = np.array(list(airports), dtype=object)
+        specs = []
+        for code, spec in airports.items():
+            if isinstance(spec, dict):
+                specs.append((spec['lat'], spec['lon'], spec.get('radius_km', default_radius_km)))
+            else:
+                specs.append(tuple(spec) if len(spec) == 3 else (spec[0], spec[1], default_radius_km))
+        self.lats, self.lons, self.radii = (np.array(column, dtype=np.float64) for column in zip(*specs))
+        self._lon_cells = int(np.ceil(360 / cell_deg))
+        self._vectors = _unit_vectors(self.lats, self.lons)
+        self._tree = None
+
+        # Register each geofence in every grid cell its bounding box touches
+        self._cells = {}
+        for i, (lat, lon, radius) in enumerate(zip(self.lats, self.lons, self.radii)):
+            lat_degree = radius / 111.0
+            lon_degree = min(180.0, radius / (111.0 * max(abs(np.cos(np.radians(lat))), 1e-6)))
+            for row in range(int(np.floor((lat - lat_degree) / cell_deg)), int(np.floor((lat + lat_degree) / cell_deg)) + 1):
+                for col in range(int(np.floor((lon - lon_degree) / cell_deg)), int(np.floor((lon + lon_degree) / cell_deg)) + 1):
+                    self._cells.setdefault(self._cell_key(row, col % self._lon_cells), []).append(i)
+        self._cells = {key: np.array(members) for key, members in self._cells.items()}
+
+    def _cell_key(self, row, col):
+        return row * self._lon_cells + col
+
+    def containing(self, lats, lons):
+        """Return a dataframe of (position, code, distance_km) for every position
+        inside an airport geofence. `position` is the index into the inputs;
+        a position inside several geofences appears once per airport."""
+        lat, lon = np.atleast_1d(_as_float(lats)), np.atleast_1d(_as_float(lons))
+        valid = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+        rows = np.floor(lat[valid] / self.cell_deg).astype(np.int64)
+        cols = np.floor(lon[valid] / self.cell_deg).astype(np.int64) % self._lon_cells
+        keys = self._cell_key(rows, cols)
+
+        # Visit each occupied cell once and test only its registered airports
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        positions, airports = [], []
+        for key, start, stop in zip(unique_keys, bounds[:-1], bounds[1:]):
+            members = self._cells.get(int(key))
+            if members is None:
+                continue
+            cell_positions = valid[order[start:stop]]
+            positions.append(np.repeat(cell_positions, len(members)))
+            airports.append(np.tile(members, len(cell_positions)))
+        if not positions:
+            return pd.DataFrame({'position': pd.Series(dtype=np.int64), 'code': pd.Series(dtype=object),
+                                 'distance_km': pd.Series(dtype=np.float64)})
+
+        positions, airports = np.concatenate(positions), np.concatenate(airports)
+        distance = haversine(lat[positions], lon[positions], self.lats[airports], self.lons[airports])
+        inside = distance <= self.radii[airports]
+        result = pd.DataFrame({
+            'position': positions[inside],
+            'code': self.codes[airports[inside]],
+            'distance_km': distance[inside],
+        })
+        return result.sort_values(['position', 'distance_km'], ignore_index=True)
+
+    def nearest(self, lats, lons, chunk_size=4096):
+        """Return (codes, distance_km) arrays with the nearest airport to each position
+        (None/NaN for missing positions)."""
+        lat, lon = np.atleast_1d(_as_float(lats)), np.atleast_1d(_as_float(lons))
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        points = _unit_vectors(lat[valid], lon[valid])
+        if len(points) == 0:
+            nearest = np.array([], dtype=np.int64)
+        elif _cKDTree is not None:
+            if self._tree is None:
+                self._tree = _cKDTree(self._vectors)
+            _, nearest = self._tree.query(points)
+        else:
+            nearest = np.concatenate([
+                np.argmax(points[i:i + chunk_size] @ self._vectors.T, axis=1)
+                for i in range(0, len(points), chunk_size)
+            ])
+        codes = np.full(len(lat), None, dtype=object)
+        distance = np.full(len(lat), np.nan)
+        codes[valid] = self.codes[nearest]
+        distance[valid] = haversine(lat[valid], lon[valid], self.lats[nearest], self.lons[nearest])
+        return codes, distance
+
+# Calculate maximum possible distance an aircraft could travel
+def calculate_max_distance(ground_speed_knots, time_delta_minutes):
+    """Calculate the maximum possible distance an aircraft could travel.
+    Scalars return None for a missing speed; arrays/Series return an ndarray with NaN."""
+    if np.ndim(ground_speed_knots) == 0 and pd.isna(ground_speed_knots):
+        return None
+    speed_kmh = _as_float(ground_speed_knots) * 1.852  # Convert knots to km/h
+    hours = time_delta_minutes / 60
+    return speed_kmh * hours
+
+# Add distance to the airport for every position in a long-format dataframe
+def add_distance_to_airport(df, center_lat, center_lon):
+    """Add a 'distance_to_airport' column in km (NaN where the position is missing)."""
+    df['distance_to_airport'] = haversine(center_lat, center_lon, df['Lat'], df['Lon'])
+    return df
+
+# Enhance dataframe with distance-related columns
+def enhance_dataframe_with_distances(df, time_delta_minutes, center_lat, center_lon):
+    """Add distance-related columns to the dataframe in a single vectorized pass.
+    Distances are NaN where a position (or a non-zero end speed) is missing."""
+    lat_start, lon_start = _as_float(df['Lat_start']), _as_float(df['Lon_start'])
+    lat_end, lon_end = _as_float(df['Lat_end']), _as_float(df['Lon_end'])
+    speed_end = _as_float(df['Ground_Speed_end'])
+    df['Start_end_Distance_km'] = haversine(lat_start, lon_start, lat_end, lon_end)
+    df['Max_Possible_Distance_km_end'] = np.where(
+        speed_end != 0, calculate_max_distance(speed_end, time_delta_minutes), np.nan
+    )
+    df['Distance_From_Airport_Start_km'] = haversine(center_lat, center_lon, lat_start, lon_start)
+    df['Distance_From_Airport_End_km'] = haversine(center_lat, center_lon, lat_end, lon_end)
+    return df
+
+# Repeated strings stored as categories on the shared vocabulary
+CATEGORY_COLUMNS = ('Flight', 'Aircraft', 'Origin', 'Destination', 'Source', 'operating_as')
+
+# Times stored as nullable Int64 unix seconds
+EPOCH_COLUMNS = ('Timestamp', 'ETA')
+
+# Base name of a wide-format column ('Origin_start' -> 'Origin')
+def _base_column(column):
+    for suffix in ('_start', '_end'):
+        if column.endswith(suffix):
+            return column[:-len(suffix)]
+    return column
+
+# Append-only category lists shared by every frame of a run
+class CategoryVocabulary:
+    """One category list per column (Origin_start and Origin_end share Origin's).
+    New values are appended and never reordered, so frames encoded at different
+    times only differ in how many categories they know about; encode() and
+    align() re-point a frame at the current list by mapping its categories,
+    without hashing the row values again."""
+
+    def __init__(self):
+        self._categories = {}
+        self._lock = threading.Lock()
+
+    def categories(self, column):
+        return self._categories.get(_base_column(column), pd.Index([], dtype=object))
+
+    def dtype(self, column):
+        return pd.CategoricalDtype(self.categories(column))
+
+    def encode(self, column, values):
+        """Return values as a Categorical on the column's current categories, adding new values."""
+        # Hash the rows once, then look up only the distinct values in the vocabulary
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            values = pd.Categorical(values)
+            local_codes, uniques = values.codes, pd.Index(values.categories, dtype=object)
+        else:
+            local_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            uniques = pd.Index(uniques, dtype=object)
+        base = _base_column(column)
+        with self._lock:
+            categories = self.categories(base)
+            codes = categories.get_indexer(uniques)
+            if (codes == -1).any():
+                categories = self._categories[base] = categories.append(uniques[codes == -1])
+                codes = categories.get_indexer(uniques)
+        codes = np.append(codes, -1)[local_codes]
+        return pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(categories))
+
+    def align(self, df):
+        """Re-point the categorical CATEGORY_COLUMNS of df at the current categories,
+        so frames can be concatenated or compared without falling back to objects."""
+        updates = {
+            column: self.encode(column, df[column]) for column in df.columns
+            if _base_column(column) in CATEGORY_COLUMNS and isinstance(df[column].dtype, pd.CategoricalDtype)
+            and df[column].dtype != self.dtype(column)
+        }
+        return df.assign(**updates) if updates else df
+
+# Categories shared by the helpers unless a vocabulary is passed explicitly
+VOCABULARY = CategoryVocabulary()
+
+# Convert datetimes, ISO strings or unix seconds to nullable Int64 unix seconds
+def epoch_seconds(values):
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return values.round().astype('Int64')
+    if not isinstance(values.dtype, pd.DatetimeTZDtype):
+        values = pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+    missing = values.isna().to_numpy()
+    seconds = values.dt.tz_convert(None).to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return pd.Series(pd.arrays.IntegerArray(np.where(missing, 0, seconds), missing), index=values.index)
+
+# Convert unix seconds (or anything pd.to_datetime reads) to UTC datetimes
+def epoch_to_datetime(values):
+    values = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+        return pd.to_datetime(values.astype('Float64'), unit='s', utc=True)
+    return pd.to_datetime(values, utc=True, errors='coerce', format='ISO8601')
+
+# Convert a frame to the pipeline dtypes
+def apply_schema(df, vocabulary=None):
+    """Give a long- or wide-format frame the dtypes snapshot_to_dataframe
+    produces: CATEGORY_COLUMNS as categoricals on the shared vocabulary,
+    nullable integer Altitude/speeds/Track, float32 Lat/Lon and EPOCH_COLUMNS
+    as Int64 unix seconds, including their _start/_end variants. Non-integral
+    values of the integer columns (e.g. averaged speeds) are rounded to the
+    nearest integer. Columns that already have the right dtype are left alone."""
+    vocabulary = vocabulary or VOCABULARY
+    updates = {}
+    for column in df.columns:
+        base = _base_column(column)
+        if base in CATEGORY_COLUMNS:
+            if df[column].dtype != vocabulary.dtype(base):
+                updates[column] = vocabulary.encode(base, df[column])
+        elif base in EPOCH_COLUMNS:
+            if df[column].dtype != 'Int64':
+                updates[column] = epoch_seconds(df[column])
+        elif base in SNAPSHOT_COLUMNS and SNAPSHOT_COLUMNS[base][1] is not None:
+            dtype = SNAPSHOT_COLUMNS[base][1]
+            if df[column].dtype != dtype:
+                values = pd.to_numeric(df[column], errors='coerce')
+                if pd.api.types.is_integer_dtype(dtype) and pd.api.types.is_float_dtype(values.dtype):
+                    values = values.round()  # Nullable integer casts reject fractions
+                updates[column] = values.astype(dtype)
+    return df.assign(**updates) if updates else df
+
+# Turn the epoch columns of a frame back into UTC datetimes (for display or CSV export)
+def with_datetimes(df):
+    updates = {column: epoch_to_datetime(df[column]) for column in df.columns
+               if _base_column(column) in EPOCH_COLUMNS and pd.api.types.is_numeric_dtype(df[column].dtype)}
+    return df.assign(**updates) if updates else df
+
+# Concatenate schema frames without losing their categorical dtypes
+def concat_frames(frames, vocabulary=None):
+    vocabulary = vocabulary or VOCABULARY
+    return pd.concat([vocabulary.align(frame) for frame in frames], ignore_index=True)
+
+# Case-insensitive substring match of an airport code, evaluated once per category
+def _contains_code(values, code):
+    code = str(code)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        hits = categories.str.contains(code, regex=False, case=False) if len(categories) else []
+        hits = np.append(np.asarray(hits, dtype=bool), False)
+        return pd.Series(hits[values.cat.codes.to_numpy()], index=values.index)
+    return values.str.contains(code, regex=False, na=False, case=False)
+
+# Long-format column -> (API field, dtype) for snapshot ingestion
+SNAPSHOT_COLUMNS = {
+    'fr24_id': ('fr24_id', None),
+    'Flight': ('flight', 'category'),
+    'Aircraft': ('type', 'category'),
+    'Origin': ('orig_iata', 'category'),
+    'Destination': ('dest_iata', 'category'),
+    'Altitude': ('alt', 'Int32'),
+    'Ground_Speed': ('gspeed', 'Int16'),
+    'Vertical_Speed': ('vspeed', 'Int32'),
+    'Lat': ('lat', np.float32),
+    'Lon': ('lon', np.float32),
+    'Source': ('source', 'category'),
+    'operating_as': ('operating_as', 'category'),
+    'Track': ('track', 'Int16'),
+}
+
+# Convert one snapshot payload into a typed long-format dataframe
+def snapshot_to_dataframe(flights, timestamp, vocabulary=None):
+    """Build the long-format dataframe for one /historic/flight-positions/full payload.
+    Columns are filled one field at a time: categorical Flight/Aircraft/Origin/
+    Destination/Source/operating_as on the shared vocabulary, float32 Lat/Lon,
+    nullable integer Altitude/speeds/Track, and Timestamp (the snapshot time)
+    and ETA as Int64 unix seconds. Missing fields become NA instead of ''."""
+    vocabulary = vocabulary or VOCABULARY
+    columns = {}
+    for column, (field, dtype) in SNAPSHOT_COLUMNS.items():
+        values = [flight.get(field) for flight in flights]
+        if dtype is None:
+            columns[column] = pd.array(values, dtype=object)
+        elif dtype == 'category':
+            columns[column] = vocabulary.encode(column, values)
+        elif dtype is np.float32:
+            columns[column] = np.array(values, dtype=np.float64).astype(np.float32)
+        else:
+            columns[column] = pd.array(values, dtype=dtype)
+    df = pd.DataFrame(columns)
+    df.insert(1, 'Timestamp', pd.array(np.full(len(df), _unix_seconds(timestamp)), dtype='Int64'))
+    df['ETA'] = epoch_seconds(pd.Series([flight.get('eta') for flight in flights], dtype=object)).array
+    return df
+
+# Convert several snapshots into one long-format dataframe
+def snapshots_to_dataframe(snapshots, vocabulary=None):
+    """Concatenate {timestamp: flights} (or (timestamp, flights) pairs) into one dataframe."""
+    items = snapshots.items() if isinstance(snapshots, dict) else snapshots
+    frames = [snapshot_to_dataframe(flights, ts, vocabulary) for ts, flights in items]
+    if not frames:
+        return snapshot_to_dataframe([], 0, vocabulary)
+    return concat_frames(frames, vocabulary)
+
+# ASCII byte -> hex digit value (255 for anything else)
+_HEX_VALUES = np.full(256, 255, dtype=np.uint8)
+_HEX_VALUES[np.frombuffer(b'0123456789', dtype=np.uint8)] = np.arange(10)
+_HEX_VALUES[np.frombuffer(b'abcdef', dtype=np.uint8)] = np.arange(10, 16)
+_HEX_VALUES[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16)
+
+# Convert fr24_id hex strings to integer keys
+def fr24_id_keys(fr24_ids):
+    """Vectorized hex fr24_id -> uint64 key (fr24_ids are 32-bit hex today).
+    Returns None if any id is missing, empty, longer than 16 digits or not hex."""
+    ids = pd.Series(fr24_ids, dtype=object).to_numpy()
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.uint64)
+    if pd.isna(ids).any():
+        return None
+    try:
+        raw = ids.astype('S')
+    except (UnicodeEncodeError, ValueError, TypeError):
+        return None
+    width = raw.dtype.itemsize
+    lengths = np.char.str_len(raw)
+    if width > 16 or (lengths == 0).any():
+        return None
+    digits = _HEX_VALUES[raw.view(np.uint8).reshape(len(raw), width)]
+    # Horner's rule one column at a time; bytes past an id's end are ignored
+    keys = np.zeros(len(raw), dtype=np.uint64)
+    for column in range(width):
+        valid = column < lengths
+        digit = digits[:, column]
+        if (digit[valid] == 255).any():
+            return None
+        keys = np.where(valid, keys * np.uint64(16) + digit, keys)
+    return keys
+
+# Convert integer keys back to fr24_id strings
+def fr24_id_strings(keys):
+    return np.array([f'{int(key):08x}' for key in keys], dtype=object)
+
+
+# Per-flight numeric state kept in one structured array
+FLIGHT_STATE_DTYPE = np.dtype([
+    ('key', np.uint64), ('first_seen', np.int64), ('last_seen', np.int64),
+    ('lat', np.float32), ('lon', np.float32), ('altitude', np.float32),
+    ('gspeed', np.float32), ('vspeed', np.float32), ('track', np.float32),
+])
+
+# Compact store of the latest state of many flights
+class FlightStateStore:
+    """Latest position, altitude, speeds and first/last seen time per flight,
+    keyed by the integer form of fr24_id in a NumPy structured array (48 bytes
+    per flight, missing values as NaN). A dict maps key -> row for O(1) lookup;
+    update() writes whole snapshots with vectorized scatter."""
+
+    def __init__(self, capacity=1024):
+        self.states = np.zeros(capacity, dtype=FLIGHT_STATE_DTYPE)
+        self.rows = {}  # key -> row
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, fr24_id):
+        keys = fr24_id_keys([fr24_id])
+        return keys is not None and int(keys[0]) in self.rows
+
+    def _reserve(self, extra):
+        if self.size + extra > len(self.states):
+            grown = np.zeros(max(2 * len(self.states), self.size + extra), dtype=FLIGHT_STATE_DTYPE)
+            grown[:self.size] = self.states[:self.size]
+            self.states = grown
+
+    def _row_indices(self, keys):
+        rows = np.empty(len(keys), dtype=np.int64)
+        new_rows = []
+        for i, key in enumerate(keys.tolist()):
+            row = self.rows.get(key)
+            if row is None:
+                row = self.rows[key] = self.size + len(new_rows)
+                new_rows.append(i)
+            rows[i] = row
+        return rows, np.array(new_rows, dtype=np.int64)
+
+    def update(self, snapshot, timestamp=None):
+        """Write one snapshot (long-format dataframe or API flight list) into the store."""
+        frame = snapshot if isinstance(snapshot, pd.DataFrame) else snapshot_to_dataframe(snapshot, timestamp)
+        frame = frame.drop_duplicates('fr24_id', keep='last')
+        keys = fr24_id_keys(frame['fr24_id'])
+        if keys is None:
+            raise ValueError("fr24_id values must be hex strings")
+        times = frame['Timestamp'] if 'Timestamp' in frame.columns else pd.Series(_unix_seconds(timestamp), index=frame.index)
+        seen = epoch_seconds(times).to_numpy(dtype=np.int64)
+
+        self._reserve(len(keys))
+        rows, new = self._row_indices(keys)
+        states = self.states
+        states['key'][rows[new]] = keys[new]
+        states['first_seen'][rows[new]] = seen[new]
+        self.size += len(new)
+        states['last_seen'][rows] = seen
+        for field, column in (('lat', 'Lat'), ('lon', 'Lon'), ('altitude', 'Altitude'), ('gspeed', 'Ground_Speed'),
+                              ('vspeed', 'Vertical_Speed'), ('track', 'Track')):
+            states[field][rows] = _as_float(frame[column]) if column in frame.columns else np.nan
+        return len(new)
+
+    def get(self, fr24_id):
+        """Return the state record (a structured scalar) of one flight, or None."""
+        keys = fr24_id_keys([fr24_id])
+        row = None if keys is None else self.rows.get(int(keys[0]))
+        return None if row is None else self.states[row]
+
+    def evict(self, before):
+        """Drop flights last seen before a time (timestamp or unix seconds); returns how many."""
+        cutoff = before if isinstance(before, (int, float, np.number)) else _unix_seconds(pd.Timestamp(before))
+        live = self.states[:self.size]
+        keep = live['last_seen'] >= cutoff
+        dropped = int((~keep).sum())
+        if dropped:
+            kept = live[keep]
+            self.states[:len(kept)] = kept
+            self.size = len(kept)
+            self.rows = dict(zip(kept['key'].tolist(), range(len(kept))))
+        return dropped
+
+    def to_dataframe(self):
+        """One row per flight with fr24_id strings and UTC timestamps."""
+        live = self.states[:self.size]
+        df = pd.DataFrame({name: live[name] for name in FLIGHT_STATE_DTYPE.names if name != 'key'})
+        df.insert(0, 'fr24_id', fr24_id_strings(live['key']))
+        for column in ('first_seen', 'last_seen'):
+            df[column] = pd.to_datetime(df[column], unit='s', utc=True)
+        return df
+
+
+# Columns carried into the wide start/end format
+PIVOT_COLUMNS = ['Timestamp', 'Flight', 'Aircraft', 'Origin', 'Destination', 'Altitude', 
+                 'Ground_Speed', 'Vertical_Speed', 'Lat', 'Lon', 'Source', 'ETA', 'distance_to_airport', 'operating_as']
+
+# Pivot dataframe to wide format
+def pivot_to_wide(df, start_time, end_time):
+    times = epoch_seconds(df['Timestamp'])
+    return pivot_pair(df[times == _unix_seconds(start_time)], df[times == _unix_seconds(end_time)])
+
+# Integer keys of a frame's fr24_ids, reusing a precomputed flight_key column
+def _frame_keys(df):
+    if 'flight_key' in df.columns:
+        return df['flight_key'].to_numpy()
+    return fr24_id_keys(df['fr24_id'])
+
+# Add integer fr24_id keys to a snapshot frame that is joined more than once
+def with_flight_keys(df):
+    keys = fr24_id_keys(df['fr24_id'])
+    return df if keys is None else df.assign(flight_key=keys)
+
+# Join a start snapshot and an end snapshot into the wide format
+def pivot_pair(start_df, end_df):
+    """Outer-join two single-snapshot frames on fr24_id with _start/_end suffixes.
+    Hex fr24_ids are joined on their integer keys (from a flight_key column
+    when with_flight_keys added one), which hashes about twice as fast as the
+    strings; other ids fall back to joining on the strings."""
+    start_keys, end_keys = _frame_keys(start_df), _frame_keys(end_df)
+    if start_keys is None or end_keys is None:
+        start_df = start_df.set_index('fr24_id')[PIVOT_COLUMNS].add_suffix('_start')
+        end_df = end_df.set_index('fr24_id')[PIVOT_COLUMNS].add_suffix('_end')
+        merged_df = start_df.join(end_df, how='outer')
+        merged_df.reset_index(inplace=True)
+        return merged_df
+
+    start_df = start_df[['fr24_id'] + PIVOT_COLUMNS].set_axis(pd.Index(start_keys)).add_suffix('_start')
+    end_df = end_df[['fr24_id'] + PIVOT_COLUMNS].set_axis(pd.Index(end_keys)).add_suffix('_end')
+    merged_df = start_df.join(end_df, how='outer')
+    fr24_id = merged_df.pop('fr24_id_start').fillna(merged_df.pop('fr24_id_end'))
+    merged_df.insert(0, 'fr24_id', fr24_id)
+    return merged_df.reset_index(drop=True)
+
+# Detect arrivals
+def clean_data_arrivals(df, airport_iata, center_lat, center_lon, radius_km, altitude_end=10, altitude_start=10):
+    """Detect arrivals using original logic on pivoted dataframe."""
+    arrivals_df = df[
+        ((df['Altitude_end'] < altitude_end) | df['Altitude_end'].isna()) &
+        _contains_code(df['Destination_start'], airport_iata) &
+        ((df['Altitude_start'] >= altitude_start) | df['Altitude_start'].isna())
+    ].copy()
+    if arrivals_df.empty:
+        print("No potential arrivals found in this interval.")
+        return arrivals_df
+    arrivals_df['Coord_end in Airport Bounds'] = _circle_flags(
+        arrivals_df['Lat_end'], arrivals_df['Lon_end'], center_lat, center_lon, radius_km
+    )
+    arrivals_df = arrivals_df[arrivals_df['Coord_end in Airport Bounds'].fillna(True).astype(bool)]
+    return arrivals_df
+
+# Detect departures
+def clean_data_departures(df, airport_iata, center_lat, center_lon, radius_km, altitude_start=10):
+    """Detect departures using original logic on pivoted dataframe."""
+    departures_df = df[
+        (_contains_code(df['Origin_start'], airport_iata) | df['Origin_start'].isna()) &
+        (_contains_code(df['Origin_end'], airport_iata) | df['Origin_end'].isna()) &
+        ((df['Altitude_start'] < altitude_start) | df['Altitude_start'].isna())
+    ].copy()
+    if departures_df.empty:
+        print("No potential departures found in this interval.")
+        return departures_df
+    departures_df['Coord_start in Airport Bounds'] = _circle_flags(
+        departures_df['Lat_start'], departures_df['Lon_start'], center_lat, center_lon, radius_km
+    )
+    departures_df['Distance_From_Airport_End_km'] = pd.to_numeric(
+        departures_df['Distance_From_Airport_End_km'], errors='coerce'
+    ).fillna(float('inf'))
+    departures_df['Max_Possible_Distance_km_end'] = pd.to_numeric(
+        departures_df['Max_Possible_Distance_km_end'], errors='coerce'
+    ).fillna(float('inf'))
+    departures_df = departures_df[
+        ~((pd.notnull(departures_df['Distance_From_Airport_End_km'])) &
+          (pd.notnull(departures_df['Max_Possible_Distance_km_end'])) &
+          (departures_df['Distance_From_Airport_End_km'] >= departures_df['Max_Possible_Distance_km_end']))
+    ]
+    departures_df = departures_df[departures_df['Coord_start in Airport Bounds'].fillna(True).astype(bool)]
+    return departures_df
+
+# Long-format rows reduced to one row per flight and value of `columns`
+def _distinct_flights(df, columns):
+    keys = _frame_keys(df)
+    flights = df[columns].assign(_flight=df['fr24_id'].to_numpy() if keys is None else keys)
+    return flights.drop_duplicates()
+
+# Most common routes
+def route_counts(df, top=10):
+    """Distinct flights per Origin/Destination pair, most common first. The
+    groupby runs on the category codes, so no route strings are hashed."""
+    routes = _distinct_flights(df, ['Origin', 'Destination']).groupby(['Origin', 'Destination'], observed=True).size()
+    return routes.sort_values(ascending=False, kind='stable').head(top).reset_index(name='Count')
+
+# Most frequent operating airlines
+def airline_counts(df, top=10):
+    """Distinct flights per operating_as ICAO code, most frequent first."""
+    airlines = _distinct_flights(df, ['operating_as']).groupby('operating_as', observed=True).size()
+    return airlines.sort_values(ascending=False, kind='stable').head(top).reset_index(name='Count')
+
+
+# Sort key for a timestamp value with missing values ordered last
+def _null_last_key(value):
+    return (1, 0) if pd.isna(value) else (0, value)
+
+# Per-flight dedup of interval detections
+class DetectionAccumulator:
+    """Keeps one merged row per fr24_id as detections stream in.
+    Equivalent to sort_values(['fr24_id', 'Timestamp_start', 'Timestamp_end'])
+    followed by groupby('fr24_id').last() (keep='last') or .first() (keep='first'),
+    without holding every interval's rows: each column keeps only the non-null
+    value with the greatest (or smallest) sort key seen so far."""
+
+    def __init__(self, keep='last'):
+        if keep not in ('first', 'last'):
+            raise ValueError("keep must be 'first' or 'last'")
+        self.keep = keep
+        self._columns = []
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    def add(self, df):
+        """Merge the detections of one interval."""
+        if df.empty:
+            return
+        for column in df.columns:
+            if column != 'fr24_id' and column not in self._columns:
+                self._columns.append(column)
+        for row in df.to_dict('records'):
+            key = (_null_last_key(row.get('Timestamp_start')), _null_last_key(row.get('Timestamp_end')))
+            values = self._flights.setdefault(row['fr24_id'], {})
+            for column, value in row.items():
+                if column == 'fr24_id' or pd.isna(value):
+                    continue  # groupby first/last skip nulls per column
+                current = values.get(column)
+                # Ties keep the earlier row for 'first' and the later one for 'last', like a stable sort
+                if current is None or (key >= current[0] if self.keep == 'last' else key < current[0]):
+                    values[column] = (key, value)
+
+    def to_dataframe(self):
+        """Return one row per fr24_id, sorted by fr24_id."""
+        rows = [
+            dict({'fr24_id': fr24_id}, **{column: value for column, (_, value) in values.items()})
+            for fr24_id, values in sorted(self._flights.items())
+        ]
+        return pd.DataFrame(rows, columns=['fr24_id'] + self._columns)
+
+
+# Streaming arrival/departure detection
+class IntervalStream:
+    """Detects arrivals and departures from snapshots pushed in time order.
+    Only the previous snapshot is kept between pushes, each snapshot gets its
+    distances computed once, and per-flight dedup happens in accumulators.
+    Memory does not grow with the number of intervals, but does with the
+    number of distinct flights: one accumulator row per detected flight and,
+    with track_flights=True, one fr24_id per flight seen in flight_ids (which
+    only feeds a count; pass track_flights=False, or use run_chunked, on long
+    runs). Frames use the apply_schema dtypes throughout, including the
+    deduplicated detections (see with_datetimes for display). Per-stage timings
+    (parse, distance, pivot, enhance, arrivals, departures) go to metrics."""
+
+    def __init__(self, airport_iata, center_lat, center_lon, radius_km, interval_minutes=None,
+                 altitude_start=10, altitude_end=10, metrics=None, vocabulary=None, track_flights=True):
+        self.airport_iata = airport_iata
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.radius_km = radius_km
+        self.interval_minutes = interval_minutes
+        self.altitude_start = altitude_start
+        self.altitude_end = altitude_end
+        self.arrivals = DetectionAccumulator(keep='last')
+        self.departures = DetectionAccumulator(keep='first')
+        self.flight_ids = set() if track_flights else None
+        self.intervals = 0
+        self.metrics = metrics if metrics is not None else METRICS
+        self.vocabulary = vocabulary or VOCABULARY
+        self._previous = None
+
+    def push(self, timestamp, snapshot):
+        """Add the next snapshot (API flight list or long-format dataframe).
+        Returns the (arrivals, departures) detected in the interval it closes."""
+        metrics, labels = self.metrics, {'airport': self.airport_iata}
+        start = time.perf_counter()
+        with metrics.timer('fr24_stage_seconds', stage='parse', **labels):
+            if isinstance(snapshot, pd.DataFrame):
+                frame = apply_schema(snapshot, self.vocabulary)
+            else:
+                frame = snapshot_to_dataframe(snapshot, timestamp, self.vocabulary)
+        with metrics.timer('fr24_stage_seconds', stage='distance', **labels):
+            frame = add_distance_to_airport(frame.drop_duplicates('fr24_id').copy(), self.center_lat, self.center_lon)
+            frame = with_flight_keys(frame)  # Each frame is joined twice, so key it once
+        if self.flight_ids is not None:
+            self.flight_ids.update(frame['fr24_id'])
+
+        previous, self._previous = self._previous, (timestamp, frame)
+        if previous is None:
+            return pd.DataFrame(), pd.DataFrame()
+        previous_timestamp, previous_frame = previous
+        minutes = self.interval_minutes or (_unix_seconds(timestamp) - _unix_seconds(previous_timestamp)) / 60
+
+        with metrics.timer('fr24_stage_seconds', stage='pivot', **labels):
+            merged_df = pivot_pair(previous_frame, frame)
+        with metrics.timer('fr24_stage_seconds', stage='enhance', **labels):
+            merged_df = enhance_dataframe_with_distances(merged_df, minutes, self.center_lat, self.center_lon)
+        with metrics.timer('fr24_stage_seconds', stage='arrivals', **labels):
+            arrivals_df = clean_data_arrivals(merged_df, self.airport_iata, self.center_lat, self.center_lon,
+                                              self.radius_km, altitude_end=self.altitude_end,
+                                              altitude_start=self.altitude_start)
+        with metrics.timer('fr24_stage_seconds', stage='departures', **labels):
+            departures_df = clean_data_departures(merged_df, self.airport_iata, self.center_lat, self.center_lon,
+                                                  self.radius_km, altitude_start=self.altitude_start)
+        known_arrivals, known_departures = len(self.arrivals), len(self.departures)
+        self.arrivals.add(arrivals_df)
+        self.departures.add(departures_df)
+        self.intervals += 1
+
+        # Detections count newly detected flights, not repeats across intervals
+        metrics.inc('fr24_intervals_total', **labels)
+        metrics.inc('fr24_rows_total', len(merged_df), **labels)
+        metrics.inc('fr24_detections_total', len(self.arrivals) - known_arrivals, kind='arrival', **labels)
+        metrics.inc('fr24_detections_total', len(self.departures) - known_departures, kind='departure', **labels)
+        metrics.event('interval', timestamp=timestamp, flights=len(merged_df), arrivals=len(arrivals_df),
+                      departures=len(departures_df), seconds=time.perf_counter() - start, **labels)
+        return arrivals_df, departures_df
+
+    def carry(self):
+        """Return an empty stream with the same settings that starts from this
+        stream's last snapshot, so the interval spanning a chunk boundary is
+        still paired. Detections, flight_ids and counters start afresh."""
+        stream = IntervalStream(self.airport_iata, self.center_lat, self.center_lon, self.radius_km,
+                                self.interval_minutes, self.altitude_start, self.altitude_end,
+                                metrics=self.metrics, vocabulary=self.vocabulary,
+                                track_flights=self.flight_ids is not None)
+        stream._previous = self._previous
+        return stream
+
+    def run(self, snapshots):
+        """Push every (timestamp, snapshot) pair from an iterable and return self."""
+        for timestamp, snapshot in snapshots:
+            self.push(timestamp, snapshot)
+        return self
+
+    def arrivals_df(self):
+        return apply_schema(self.arrivals.to_dataframe(), self.vocabulary)
+
+    def departures_df(self):
+        return apply_schema(self.departures.to_dataframe(), self.vocabulary)
+
+
+# Fetch snapshots in time order with bounded read-ahead
+def stream_snapshots(timestamps, airport_code, headers, batch_size=8, **kwargs):
+    """Yield (timestamp, flights) in order, fetching batch_size snapshots at a
+    time with get_snapshots so at most one batch is held in memory."""
+    timestamps = list(timestamps)
+    for i in range(0, len(timestamps), batch_size):
+        batch = timestamps[i:i + batch_size]
+        flights_list, cost_info = get_snapshots(batch, airport_code, headers, **kwargs)
+        print(f"Fetched {len(batch)} snapshots ({cost_info['total_credits']} credits)")
+        yield from zip(batch, flights_list)
+
+
+# Snapshot times of a long period, chunk_hours at a time
+def time_chunks(start, end, interval_minutes, chunk_hours=24):
+    """Yield lists of snapshot times from start to end (inclusive) every
+    interval_minutes, one list per chunk_hours. Chunks do not overlap;
+    run_chunked pairs the last time of a chunk with the first of the next."""
+    step = timedelta(minutes=interval_minutes)
+    per_chunk = max(1, int(round(chunk_hours * 60 / interval_minutes)))
+    chunk, current = [], start
+    while current <= end:
+        chunk.append(current)
+        current += step
+        if len(chunk) == per_chunk:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Label of a chunk's files, sorting in time order
+def _chunk_label(timestamp):
+    return pd.Timestamp(_unix_seconds(timestamp), unit='s', tz='UTC').strftime('%Y%m%dT%H%M%SZ')
+
+# Directory of one chunked run, named after everything that shapes its detections
+def _chunk_run_dir(output_dir, stream, params):
+    settings = {
+        'airport_iata': stream.airport_iata, 'center_lat': stream.center_lat, 'center_lon': stream.center_lon,
+        'radius_km': stream.radius_km, 'interval_minutes': stream.interval_minutes,
+        'altitude_start': stream.altitude_start, 'altitude_end': stream.altitude_end,
+    }
+    settings.update(params or {})
+    payload = json.dumps(settings, sort_keys=True, default=str)
+    run_id = f"{stream.airport_iata}-{hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]}"
+    return os.path.join(output_dir, run_id), settings
+
+# Write a CSV through a temporary file so an interrupted run leaves no partial chunk
+def _write_csv_atomic(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_csv(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+# Detect over a long period chunk by chunk, spilling detections to disk
+def run_chunked(stream, chunks, fetch, output_dir, resume=True, params=None):
+    """Run an IntervalStream over chunks of snapshot times (e.g. from
+    time_chunks), holding one chunk at a time. fetch(times) returns the
+    (timestamp, snapshot) pairs of a chunk, e.g.
+    lambda times: stream_snapshots(times, 'ARN', headers, cache=cache).
+    Only the last snapshot is carried into the next chunk (IntervalStream.carry),
+    so every consecutive pair is still pivoted, and each chunk's per-interval
+    detections go to <run>/arrivals/<first>_<last>.csv and
+    <run>/departures/<first>_<last>.csv. <run> is a directory under
+    output_dir named after the stream settings and params (e.g. the query
+    filters), which are also written to its manifest.json, so runs with
+    different settings never share chunks. Memory is bounded by one chunk's
+    detections plus the fetch batch, not by the length of the period.
+    With resume=True chunks whose files exist are skipped; the chunk after a
+    skipped one refetches the skipped chunk's last snapshot to pair across.
+    Returns a summary dict whose run_dir and labels select this run's chunks
+    for read_chunked_detections."""
+    run_dir, settings = _chunk_run_dir(output_dir, stream, params)
+    os.makedirs(run_dir, exist_ok=True)
+    with open(os.path.join(run_dir, 'manifest.json'), 'w') as f:
+        json.dump(settings, f, indent=2, sort_keys=True, default=str)
+    summary = {'chunks': 0, 'skipped': 0, 'intervals': 0, 'run_dir': run_dir, 'labels': []}
+    boundary = None  # Last time of a skipped chunk, fetched again to seed the next one
+    for times in chunks:
+        # Both ends in the name, so a chunk cut short by an earlier period's end is not reused
+        label = f"{_chunk_label(times[0])}_{_chunk_label(times[-1])}"
+        summary['labels'].append(label)
+        paths = {kind: os.path.join(run_dir, kind, f"{label}.csv") for kind in ('arrivals', 'departures')}
+        if resume and all(os.path.exists(path) for path in paths.values()):
+            summary['intervals'] += len(times) - (1 if len(summary['labels']) == 1 else 0)
+            boundary, stream = times[-1], stream.carry()
+            stream._previous = None
+            summary['skipped'] += 1
+            continue
+
+        if boundary is not None and stream._previous is None:
+            times = [boundary] + list(times)
+        detected = {'arrivals': [], 'departures': []}
+        for timestamp, snapshot in fetch(times):
+            arrivals_df, departures_df = stream.push(timestamp, snapshot)
+            for kind, df in (('arrivals', arrivals_df), ('departures', departures_df)):
+                if not df.empty:
+                    detected[kind].append(df)
+        # Departures first: a chunk counts as done once its arrivals file exists
+        for kind in ('departures', 'arrivals'):
+            frames = detected[kind]
+            _write_csv_atomic(pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['fr24_id']),
+                              paths[kind])
+        print(f"Chunk {label}: {stream.intervals} intervals, {len(stream.arrivals)} arrivals, "
+              f"{len(stream.departures)} departures")
+        summary['chunks'] += 1
+        summary['intervals'] += stream.intervals
+        boundary, stream = None, stream.carry()
+    return summary
+
+# Merge the detections spilled by run_chunked
+def read_chunked_detections(run_dir, labels, kind='arrivals', vocabulary=None):
+    """One row per fr24_id from the chunk files of kind ('arrivals' or
+    'departures') named in labels (summary['run_dir'] and summary['labels']
+    from run_chunked), read one file at a time in time order through a
+    DetectionAccumulator with IntervalStream's keep rule, so the result
+    matches a single IntervalStream run over the whole period."""
+    accumulator = DetectionAccumulator(keep='last' if kind == 'arrivals' else 'first')
+    for label in sorted(labels):
+        df = pd.read_csv(os.path.join(run_dir, kind, f"{label}.csv"), dtype={'fr24_id': str},
+                         float_precision='round_trip')
+        accumulator.add(apply_schema(df, vocabulary))
+    return apply_schema(accumulator.to_dataframe(), vocabulary)
+
+
+# Last known state of one live flight
+class LiveFlight:
+    """Compact per-flight record kept by LiveMonitor."""
+    __slots__ = ('fr24_id', 'flight', 'origin', 'destination', 'seen_at', 'altitude', 'lat', 'lon',
+                 'gspeed', 'inside', 'phase', 'arrived', 'departed')
+
+    def __init__(self, fr24_id):
+        self.fr24_id = fr24_id
+        self.altitude = None
+        self.inside = True
+        self.seen_at = None
+        self.arrived = False
+        self.departed = False
+        self.phase = None
+
+
+# Incremental arrival/departure detection on live positions
+class LiveMonitor:
+    """Per-fr24_id state machine fed one live poll at a time.
+    Phases are 'ground' and 'airborne' ('approaching' when inbound to the
+    airport); 'landed' and 'departed' follow an event. The transitions use the
+    clean_data_arrivals/clean_data_departures thresholds:
+    - arrival: airborne (altitude >= altitude_start) -> below altitude_end inside
+      the radius, destination matching; an inbound airborne flight that goes
+      stale, or one first seen on the ground after the first poll, counts as an
+      inferred arrival, as a missing start or end position does in batch
+    - departure: below altitude_start inside the radius -> airborne, origin
+      matching; a flight first seen airborne after the first poll counts when it
+      is within reach (ground speed x time since the last poll) of the airport
+    Flights unseen for stale_seconds are evicted, and at most max_flights are
+    kept (least recently seen evicted first), so memory stays bounded."""
+
+    def __init__(self, airport_iata, center_lat, center_lon, radius_km=5, altitude_start=10, altitude_end=10,
+                 stale_seconds=600, max_flights=50000, metrics=None):
+        self.airport_iata = str(airport_iata).upper()
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.radius_km = radius_km
+        self.altitude_start = altitude_start
+        self.altitude_end = altitude_end
+        self.stale_seconds = stale_seconds
+        self.max_flights = max_flights
+        self.metrics = metrics if metrics is not None else METRICS
+        self.flights = {}  # fr24_id -> LiveFlight, in least-recently-seen order
+        self.polls = 0
+        self._last_poll = None
+
+    def __len__(self):
+        return len(self.flights)
+
+    def _matches(self, code):
+        return isinstance(code, str) and self.airport_iata in code.upper()
+
+    def _event(self, kind, state, inferred=False):
+        self.metrics.inc('fr24_live_events_total', kind=kind, airport=self.airport_iata)
+        return {
+            'event': kind, 'fr24_id': state.fr24_id, 'flight': state.flight,
+            'origin': state.origin, 'destination': state.destination,
+            'time': pd.Timestamp(state.seen_at, unit='s', tz='UTC'),
+            'lat': state.lat, 'lon': state.lon, 'altitude': state.altitude, 'inferred': inferred,
+        }
+
+    def update(self, flights, now=None):
+        """Apply one poll (API flight list) and return the events it triggers, in order.
+        Times come from each flight's 'timestamp' when present; now defaults to
+        the latest of them (or the wall clock) and drives eviction."""
+        count = len(flights)
+        lat = _as_float([f.get('lat') for f in flights])
+        lon = _as_float([f.get('lon') for f in flights])
+        distance = haversine(lat, lon, self.center_lat, self.center_lon) if count else np.array([])
+        inside = np.isnan(distance) | (distance <= self.radius_km)  # Missing positions count as inside
+        stamps = pd.to_datetime(pd.Series([f.get('timestamp') for f in flights], dtype=object),
+                                utc=True, errors='coerce', format='ISO8601')
+        seen = stamps.to_numpy(dtype='datetime64[ns]').astype(np.int64) / 1e9
+        if now is None:
+            now = np.nanmax(np.where(stamps.isna(), np.nan, seen)) if count and stamps.notna().any() else time.time()
+        else:
+            now = _unix_seconds(pd.Timestamp(now))
+        seen = np.where(stamps.isna(), now, seen)
+        minutes_since_poll = None if self._last_poll is None else (now - self._last_poll) / 60
+
+        events = []
+        flights_state = self.flights
+        for i, flight in enumerate(flights):
+            fr24_id = flight.get('fr24_id')
+            if fr24_id is None:
+                continue
+            state = flights_state.pop(fr24_id, None)
+            is_new = state is None
+            if is_new:
+                state = LiveFlight(fr24_id)
+            previous_altitude, previous_inside, previous_seen = state.altitude, state.inside, state.seen_at
+
+            altitude = flight.get('alt')
+            state.flight = flight.get('flight')
+            state.origin = flight.get('orig_iata')
+            state.destination = flight.get('dest_iata')
+            state.seen_at, state.altitude, state.inside = seen[i], altitude, bool(inside[i])
+            state.lat, state.lon, state.gspeed = flight.get('lat'), flight.get('lon'), flight.get('gspeed')
+            airborne = altitude is not None and altitude >= self.altitude_start
+
+            was_airborne = (minutes_since_poll is not None) if is_new else \
+                (previous_altitude is None or previous_altitude >= self.altitude_start)
+            if not state.arrived and was_airborne and self._matches(state.destination) \
+                    and (altitude is None or altitude < self.altitude_end) and state.inside:
+                state.arrived = True
+                events.append(self._event('arrival', state, inferred=is_new))
+            elif not state.departed and airborne and self._matches(state.origin):
+                if not is_new:
+                    was_on_ground = previous_altitude is None or previous_altitude < self.altitude_start
+                    minutes = (state.seen_at - previous_seen) / 60
+                    if was_on_ground and previous_inside and self._within_reach(state.gspeed, minutes, distance[i]):
+                        state.departed = True
+                        events.append(self._event('departure', state))
+                elif minutes_since_poll is not None and self._within_reach(state.gspeed, minutes_since_poll, distance[i]):
+                    state.departed = True
+                    events.append(self._event('departure', state, inferred=True))
+
+            if state.arrived:
+                state.phase = 'landed'
+            elif state.departed:
+                state.phase = 'departed'
+            elif airborne:
+                state.phase = 'approaching' if self._matches(state.destination) else 'airborne'
+            else:
+                state.phase = 'ground'
+            flights_state[fr24_id] = state  # Re-insert as most recently seen
+
+        self._last_poll = now
+        self.polls += 1
+        events.extend(self.evict(now))
+        return events
+
+    def _within_reach(self, gspeed, minutes, distance):
+        reach = calculate_max_distance(gspeed, minutes)
+        return reach is None or np.isnan(distance) or distance < reach
+
+    def evict(self, now):
+        """Drop flights unseen since now - stale_seconds (unix seconds or a
+        timestamp) and the oldest beyond max_flights. Inbound airborne flights
+        dropped this way are reported as inferred arrivals."""
+        now = now if isinstance(now, (int, float, np.number)) else _unix_seconds(pd.Timestamp(now))
+        cutoff = now - self.stale_seconds
+        events = []
+        while self.flights:
+            fr24_id, state = next(iter(self.flights.items()))
+            if state.seen_at >= cutoff and len(self.flights) <= self.max_flights:
+                break
+            del self.flights[fr24_id]
+            if not state.arrived and self._matches(state.destination) \
+                    and (state.altitude is None or state.altitude >= self.altitude_start):
+                state.arrived = True
+                events.append(self._event('arrival', state, inferred=True))
+            self.metrics.inc('fr24_live_evictions_total', airport=self.airport_iata)
+        return events
+
+# Poll the live endpoint and yield arrival/departure events
+def monitor_live(airport_code, airport_iata, center_lat, center_lon, headers, interval_seconds=5, radius_km=5,
+                 client=None, limiter=None, max_polls=None, monitor=None, limit=1000, **filters):
+    """Poll /live/flight-positions/full for an airport every interval_seconds
+    and yield LiveMonitor events as they happen (stops after max_polls polls).
+    Cost: 8 credits per returned flight per poll
+    Endpoint: /api/live/flight-positions/full"""
+    client = client or get_client(headers)
+    monitor = monitor or LiveMonitor(airport_iata, center_lat, center_lon, radius_km)
+    params = _snapshot_params(None, airport_code, limit, **filters)
+    del params['timestamp']
+    polls = 0
+    while max_polls is None or polls < max_polls:
+        started = time.monotonic()
+        with monitor.metrics.timer('fr24_live_poll_seconds', airport=monitor.airport_iata):
+            flights, _ = client.live_positions(params, limiter=limiter)
+            events = monitor.update(flights)
+        yield from events
+        polls += 1
+        if max_polls is None or polls < max_polls:
+            time.sleep(max(0.0, interval_seconds - (time.monotonic() - started)))
+
+# Keep the rows of a combined snapshot that a both:<airport> query would have returned
+def _airport_rows(frame, airport_iata):
+    related = _contains_code(frame['Origin'], airport_iata) | _contains_code(frame['Destination'], airport_iata)
+    return frame[related.to_numpy()]
+
+# Run streaming detection for one airport (executed in a worker process)
+def _detect_airport(job):
+    airport_iata, center_lat, center_lon, radius_km, interval_minutes, frames = job
+    stream = IntervalStream(airport_iata, center_lat, center_lon, radius_km, interval_minutes)
+    stream.run(frames)
+    return stream.arrivals_df(), stream.departures_df(), len(stream.flight_ids)
+
+# Detect arrivals and departures at several airports from shared snapshots
+def run_multi_airport(airports, timestamps, headers, radius_km=5, interval_minutes=None,
+                      airports_per_query=8, limit_per_airport=1000, max_workers=None, **fetch_kwargs):
+    """Run the interval detection for several airports at once.
+    `airports` maps code -> airport details (needs 'iata', 'lat', 'lon'); a list of
+    codes is looked up with get_airport_details. Airports are grouped into as few
+    snapshot queries per timestamp as possible using the multi-value airports
+    filter, so flights between two of them are paid for once. Detection then runs
+    per airport in parallel worker processes, each sent only the rows that
+    can concern its airport.
+    Returns ({code: {'arrivals', 'departures', 'flights'}}, cost_info)."""
+    if not isinstance(airports, dict):
+        airports = {code: get_airport_details(code, headers) for code in airports}
+    codes = list(airports)
+    groups = [codes[i:i + airports_per_query] for i in range(0, len(codes), airports_per_query)]
+
+    # One combined query per group and timestamp; each snapshot is parsed once
+    frames = {ts: [] for ts in timestamps}
+    cost_info = {'flights_returned': 0, 'total_credits': 0, 'total_cost': 0, 'queries': 0}
+    for group in groups:
+        limit = min(30000, limit_per_airport * len(group))
+        flights_list, group_cost = get_snapshots(timestamps, group, headers, limit=limit, **fetch_kwargs)
+        for ts, flights in zip(timestamps, flights_list):
+            frames[ts].append(snapshot_to_dataframe(flights, ts))
+        _add_costs(cost_info, group_cost)
+        cost_info['queries'] += len(timestamps)
+    frames = [(ts, concat_frames(parts).drop_duplicates('fr24_id')) for ts, parts in frames.items()]
+
+    # Rows are narrowed to each airport here, so a job pickles only its own share of the snapshots
+    jobs = [
+        (airports[code]['iata'], airports[code]['lat'], airports[code]['lon'], radius_km, interval_minutes,
+         [(ts, _airport_rows(frame, airports[code]['iata'])) for ts, frame in frames])
+        for code in codes
+    ]
+    del frames
+    with ProcessPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count() or 1)) as pool:
+        outputs = list(pool.map(_detect_airport, jobs))
+
+    results = {
+        code: {'arrivals': arrivals, 'departures': departures, 'flights': flights}
+        for code, (arrivals, departures, flights) in zip(codes, outputs)
+    }
+    return results, cost_info
+
+
+# Find flights whose outcome in an interval is ambiguous
+def find_ambiguous_flights(merged_df, airport_iata, time_delta_minutes, radius_km=5):
+    """Return fr24_ids of airport-related flights seen at only one end of the
+    interval that could have reached the airport's circle in the meantime,
+    e.g. Altitude_start >= 10 near the airport with Altitude_end NaN.
+    Expects the columns added by enhance_dataframe_with_distances."""
+    related = pd.Series(False, index=merged_df.index)
+    for column in ('Origin_start', 'Origin_end', 'Destination_start', 'Destination_end'):
+        related |= _contains_code(merged_df[column], airport_iata)
+    missing_start = merged_df['Altitude_start'].isna().to_numpy()
+    missing_end = merged_df['Altitude_end'].isna().to_numpy()
+
+    # Distance from the airport and reach within the interval, from whichever end was seen
+    distance = np.where(missing_end, _as_float(merged_df['Distance_From_Airport_Start_km']),
+                        _as_float(merged_df['Distance_From_Airport_End_km']))
+    speed = np.where(missing_end, _as_float(merged_df['Ground_Speed_start']),
+                     _as_float(merged_df['Ground_Speed_end']))
+    reach = calculate_max_distance(speed, time_delta_minutes) + radius_km
+    reachable = np.isnan(distance) | np.isnan(reach) | (distance <= reach)
+
+    ambiguous = related.to_numpy() & (missing_start ^ missing_end) & reachable
+    return merged_df.loc[ambiguous, 'fr24_id'].tolist()
+
+# Pick the flights snapshot-based detection could not resolve
+def select_unresolved_flights(snapshots, airport_iata, center_lat, center_lon, radius_km=5, interval_minutes=None):
+    """Run find_ambiguous_flights over consecutive (timestamp, snapshot) pairs
+    and return the fr24_ids worth a /flight-tracks lookup, in first-seen order.
+    Snapshots may be API flight lists or long-format dataframes."""
+    selected = {}
+    previous = None
+    for timestamp, snapshot in snapshots:
+        frame = snapshot if isinstance(snapshot, pd.DataFrame) else snapshot_to_dataframe(snapshot, timestamp)
+        frame = add_distance_to_airport(frame.drop_duplicates('fr24_id').copy(), center_lat, center_lon)
+        if previous is not None:
+            previous_timestamp, previous_frame = previous
+            minutes = interval_minutes or (_unix_seconds(timestamp) - _unix_seconds(previous_timestamp)) / 60
+            merged_df = enhance_dataframe_with_distances(pivot_pair(previous_frame, frame), minutes,
+                                                         center_lat, center_lon)
+            selected.update(dict.fromkeys(find_ambiguous_flights(merged_df, airport_iata, minutes, radius_km)))
+        previous = (timestamp, frame)
+    return list(selected)
+
+# pd.Timestamp in UTC, reading naive times as UTC
+def _utc_timestamp(value):
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+# Overlap of two bounds strings (an empty box if they do not overlap)
+def _intersect_bounds(a, b):
+    (north_a, south_a, west_a, east_a), (north_b, south_b, west_b, east_b) = _parse_bounds(a), _parse_bounds(b)
+    north, south = min(north_a, north_b), max(south_a, south_b)
+    west, east = max(west_a, west_b), min(east_a, east_b)
+    return f"{north:.3f},{min(south, north):.3f},{west:.3f},{max(east, west):.3f}"
+
+# Fill a bounds-restricted snapshot with flights the query could not see
+def _complete_bounded_frame(frame, previous_frame, bounds, timestamp):
+    north, south, west, east = _parse_bounds(bounds)
+    lat, lon = _as_float(previous_frame['Lat']), _as_float(previous_frame['Lon'])
+    outside = ~((lat <= north) & (lat >= south) & (lon >= west) & (lon <= east))
+    # Flights outside the bounds earlier are carried forward; flights inside that are gone really vanished
+    carried = previous_frame[outside & ~previous_frame['fr24_id'].isin(frame['fr24_id']).to_numpy()].copy()
+    carried['Timestamp'] = frame['Timestamp'].iloc[0] if len(frame) else _unix_seconds(timestamp)
+    return concat_frames([frame, carried]) if len(carried) else frame
+
+# Sample snapshots coarsely and bisect only ambiguous intervals
+def adaptive_snapshots(start_time, end_time, airport_code, airport_iata, center_lat, center_lon, headers,
+                       coarse_minutes=30, min_minutes=0.25, radius_km=5, refine_radius_km=None, **fetch_kwargs):
+    """Fetch a coarse snapshot grid, then bisect intervals in which
+    find_ambiguous_flights reports flights until they are resolved or
+    min_minutes is reached. Midpoints use bounds-restricted get_snapshot calls
+    around the airport (within any bounds filter of the coarse grid), so they
+    only pay for nearby flights; flights outside the bounds are carried
+    forward from the previous snapshot. fetch_kwargs holds get_snapshots
+    options (limiter, max_workers, cache, client, light, tiling) and query
+    filters (limit, bounds, gspeed, altitude_ranges, categories).
+    Returns (time-ordered list of (timestamp, dataframe), cost_info) ready for
+    IntervalStream(..., interval_minutes=None).run()."""
+    start_time, end_time = _utc_timestamp(start_time), _utc_timestamp(end_time)
+    steps = int(np.ceil((end_time - start_time) / pd.Timedelta(minutes=coarse_minutes)))
+    coarse = [min(start_time + pd.Timedelta(minutes=coarse_minutes * i), end_time) for i in range(steps + 1)]
+    options = {key: fetch_kwargs.pop(key) for key in FETCH_OPTIONS if key in fetch_kwargs}
+    filters = fetch_kwargs
+
+    flights_list, cost_info = get_snapshots(coarse, airport_code, headers, **options, **filters)
+    cost_info = {key: cost_info[key] for key in COST_KEYS}
+    cost_info['refinements'] = 0
+    frames = {}
+    for ts, flights in zip(coarse, flights_list):
+        frames[ts] = add_distance_to_airport(snapshot_to_dataframe(flights, ts), center_lat, center_lon)
+
+    bounds = calculate_bounds(center_lat, center_lon, refine_radius_km or radius_km * 3)
+    if filters.get('bounds'):
+        bounds = _intersect_bounds(bounds, filters['bounds'])
+    client = options.get('client') or get_client(headers)
+    limiter = options.get('limiter') or client.limiter
+
+    def fetch_midpoint(ts):
+        query = dict(filters, bounds=bounds)
+        if options.get('tiling') is not None:
+            return get_tiled_snapshot(ts, airport_code, headers, tiling=options['tiling'], cache=options.get('cache'),
+                                      client=client, limiter=limiter, light=options.get('light', False), **query)
+        params = _snapshot_params(ts, airport_code, **query)
+        return client.snapshot(params, cache=options.get('cache'), limiter=limiter, light=options.get('light', False))
+
+    pending = list(zip(coarse[:-1], coarse[1:]))
+    while pending:
+        a, b = pending.pop()
+        minutes = (b - a) / pd.Timedelta(minutes=1)
+        if minutes / 2 < min_minutes:
+            continue
+        merged_df = enhance_dataframe_with_distances(pivot_pair(frames[a], frames[b]), minutes, center_lat, center_lon)
+        if not find_ambiguous_flights(merged_df, airport_iata, minutes, radius_km):
+            continue
+
+        mid = pd.Timestamp(_unix_seconds(a + (b - a) / 2), unit='s', tz='UTC')
+        if mid <= a or mid >= b:
+            continue
+        flights, mid_cost = fetch_midpoint(_unix_seconds(mid))
+        _add_costs(cost_info, mid_cost)
+        cost_info['refinements'] += 1
+        frame = add_distance_to_airport(snapshot_to_dataframe(flights, mid), center_lat, center_lon)
+        frames[mid] = _complete_bounded_frame(frame, frames[a], bounds, mid)
+        pending.extend([(mid, b), (a, mid)])
+
+    return sorted(frames.items()), cost_info
+
+
+# OurAirports runways.csv column -> runway geometry column
+OURAIRPORTS_RUNWAY_COLUMNS = {
+    'le_ident': 'ident1', 'le_latitude_deg': 'lat1', 'le_longitude_deg': 'lon1',
+    'he_ident': 'ident2', 'he_latitude_deg': 'lat2', 'he_longitude_deg': 'lon2',
+}
+
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 6371.0 * np.pi / 180
+
+# Keep low, fast points (ground rolls) in flight/time order
+def _ground_roll_points(tracks_df, max_altitude=10, min_speed=25):
+    mask = (tracks_df['Altitude'] <= max_altitude) & (tracks_df['Ground_Speed'] > min_speed)
+    runway_df = tracks_df[mask.fillna(False).astype(bool)]
+    return runway_df.sort_values(['fr24_id', 'Timestamp'], kind='stable').reset_index(drop=True)
+
+# Ordered ground-roll paths per flight
+def runway_paths(tracks_df, max_altitude=10, min_speed=25):
+    """Lat/Lon/Track lists per fr24_id in time order, built with one sort and one groupby."""
+    runway_df = _ground_roll_points(tracks_df, max_altitude, min_speed)
+    return runway_df.groupby('fr24_id', sort=True)[['Lat', 'Lon', 'Track']].agg(list)
+
+# Precompute runway centerlines from threshold coordinates
+def runway_geometry(runways):
+    """Normalize runway thresholds (records or a DataFrame with ident1/lat1/lon1/
+    ident2/lat2/lon2, or OurAirports le_*/he_* columns) into centerlines with
+    true heading from end 1 to end 2 and length in km."""
+    df = pd.DataFrame(runways).rename(columns=OURAIRPORTS_RUNWAY_COLUMNS)
+    df = df.dropna(subset=['lat1', 'lon1', 'lat2', 'lon2']).reset_index(drop=True)
+    center_lat = (df['lat1'] + df['lat2']) / 2
+    east = (df['lon2'] - df['lon1']) * np.cos(np.radians(center_lat)) * KM_PER_DEGREE
+    north = (df['lat2'] - df['lat1']) * KM_PER_DEGREE
+    return pd.DataFrame({
+        'name': df['ident1'].astype(str) + '/' + df['ident2'].astype(str),
+        'ident1': df['ident1'], 'ident2': df['ident2'],
+        'lat1': df['lat1'], 'lon1': df['lon1'], 'lat2': df['lat2'], 'lon2': df['lon2'],
+        'center_lat': center_lat,
+        'heading': np.degrees(np.arctan2(east, north)) % 360,
+        'length_km': np.hypot(east, north),
+    })
+
+# Designator implied by a heading alone
+def heading_designator(heading, magnetic_variation=0.0):
+    """Two-digit runway number for a true heading (e.g. 255 -> '26' with 0 variation).
+    Runway numbers are magnetic, so pass the local variation (east positive)."""
+    number = np.round(((_as_float(heading) - magnetic_variation) % 360) / 10).astype(int)
+    number = np.where(number == 0, 36, number)
+    return pd.Series(number).map('{:02d}'.format).to_numpy()
+
+# Assign ground rolls to runways
+def assign_runways(tracks_df, runways=None, max_altitude=10, min_speed=25, max_offset_km=0.1,
+                   max_heading_diff=20, end_margin_km=0.5, magnetic_variation=0.0):
+    """One row per fr24_id with its ground roll: first/last time and position,
+    mean heading, point count, Roll ('takeoff'/'landing' from the speed change,
+    or from the first Vertical_Speed when speed changes by 10 kts or less),
+    Runway (e.g. '08/26') and Designator (e.g. '26').
+    Each point is matched against every runway centerline at once (cross-track
+    offset, along-track extent and Track within max_heading_diff of either
+    direction); a flight takes its most common match. Without geometry, or
+    when nothing matches, Designator falls back to heading_designator."""
+    points = _ground_roll_points(tracks_df, max_altitude, min_speed)
+    lat, lon = _as_float(points['Lat']), _as_float(points['Lon'])
+    track = _as_float(points['Track'])
+
+    extra = [c for c in ('Flight', 'Origin', 'Destination', 'operating_as') if c in points.columns]
+    grouped = points.assign(_sin=np.sin(np.radians(track)), _cos=np.cos(np.radians(track))).groupby('fr24_id', sort=True)
+    rolls = grouped.agg(
+        Time_start=('Timestamp', 'first'), Time_end=('Timestamp', 'last'),
+        Lat_start=('Lat', 'first'), Lon_start=('Lon', 'first'),
+        Lat_end=('Lat', 'last'), Lon_end=('Lon', 'last'),
+        Speed_start=('Ground_Speed', 'first'), Speed_end=('Ground_Speed', 'last'),
+        **({'Climb_start': ('Vertical_Speed', 'first')} if 'Vertical_Speed' in points.columns else {}),
+        Points=('Lat', 'size'), _sin=('_sin', 'mean'), _cos=('_cos', 'mean'),
+        **{column: (column, 'first') for column in extra},
+    )
+    rolls['Heading'] = np.degrees(np.arctan2(rolls.pop('_sin'), rolls.pop('_cos'))) % 360
+    speed_change = _as_float(rolls.pop('Speed_end')) - _as_float(rolls.pop('Speed_start'))
+    climb = _as_float(rolls.pop('Climb_start')) if 'Climb_start' in rolls else np.full(len(rolls), np.nan)
+    rolls['Roll'] = np.select(
+        [speed_change > 10, speed_change < -10, climb < 0, climb > 0],
+        ['takeoff', 'landing', 'landing', 'takeoff'], default=None,
+    )
+    rolls['Runway'] = None
+    rolls['Designator'] = heading_designator(rolls['Heading'], magnetic_variation) if len(rolls) else []
+
+    geometry = runway_geometry(runways) if runways is not None else None
+    if geometry is not None and len(geometry) and len(points):
+        # Points x runways in a local east/north frame anchored at each runway's end 1
+        cos_lat = np.cos(np.radians(geometry['center_lat'].to_numpy()))
+        east = (lon[:, None] - geometry['lon1'].to_numpy()) * cos_lat * KM_PER_DEGREE
+        north = (lat[:, None] - geometry['lat1'].to_numpy()) * KM_PER_DEGREE
+        heading = np.radians(geometry['heading'].to_numpy())
+        along = east * np.sin(heading) + north * np.cos(heading)
+        cross = np.abs(east * np.cos(heading) - north * np.sin(heading))
+        within = (cross <= max_offset_km) & (along >= -end_margin_km) & \
+            (along <= geometry['length_km'].to_numpy() + end_margin_km)
+        difference = np.abs((track[:, None] - geometry['heading'].to_numpy() + 180) % 360 - 180)
+        forward = difference <= max_heading_diff
+        aligned = forward | (difference >= 180 - max_heading_diff)
+        score = np.where(within & aligned, cross, np.inf)
+        best = score.argmin(axis=1)
+        rows = np.arange(len(points))
+        matched = np.isfinite(score[rows, best])
+
+        votes = pd.DataFrame({
+            'fr24_id': points['fr24_id'].to_numpy()[matched],
+            'runway': best[matched],
+            'forward': forward[rows, best][matched],
+        })
+        if len(votes):
+            counts = votes.value_counts(['fr24_id', 'runway', 'forward'], sort=False).reset_index(name='n')
+            winners = counts.sort_values('n', ascending=False, kind='stable').drop_duplicates('fr24_id')
+            winners = winners.set_index('fr24_id')
+            runway = geometry.loc[winners['runway'].to_numpy()]
+            designator = np.where(winners['forward'], runway['ident1'], runway['ident2'])
+            rolls.loc[winners.index, 'Runway'] = runway['name'].to_numpy()
+            rolls.loc[winners.index, 'Designator'] = designator
+    return rolls.reset_index()
+
+# Runway usage counts over time
+def runway_usage(assignments, freq='1h', by='Designator'):
+    """Count ground rolls per time bucket (by Time_start) and runway column."""
+    if assignments.empty:
+        return pd.DataFrame()
+    assignments = assignments.assign(Time_start=epoch_to_datetime(assignments['Time_start']))
+    return assignments.groupby([pd.Grouper(key='Time_start', freq=freq), by], observed=True).size().unstack(fill_value=0)
+
+# Import pyarrow lazily; it is only needed for the Parquet output store
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("The Parquet output store requires pyarrow (pip install pyarrow)") from e
+    return pyarrow, pyarrow.dataset
+
+# Write a dataframe as a Parquet dataset partitioned by airport and date
+def write_dataset(df, airport, root=DATASET_DIR, time_columns=('Timestamp', 'Timestamp_start', 'Timestamp_end')):
+    """Append df to root/airport=<code>/date=<YYYY-MM-DD>/ as typed Parquet files.
+    The date comes from the first of time_columns present in df, falling back
+    row by row to the next one when it is missing (e.g. arrivals with no
+    Timestamp_start). Timestamps (datetimes or epoch seconds) and categories
+    keep their dtype instead of becoming strings."""
+    pa, ds = _require_pyarrow()
+    present = [column for column in time_columns if column in df.columns]
+    if not present:
+        raise ValueError(f"df needs one of the time columns {time_columns}")
+    times = epoch_to_datetime(df[present[0]])
+    for column in present[1:]:
+        times = times.fillna(epoch_to_datetime(df[column]))
+
+    df = df.assign(airport=airport, date=times.dt.strftime('%Y-%m-%d').fillna('unknown'))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    ds.write_dataset(
+        table, root, format='parquet', partitioning=['airport', 'date'], partitioning_flavor='hive',
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet", existing_data_behavior='overwrite_or_ignore'
+    )
+
+# Read a partitioned Parquet dataset
+def read_dataset(root=DATASET_DIR, columns=None, airports=None, start_date=None, end_date=None, filters=None):
+    """Load a dataset written by write_dataset. Only the requested columns are
+    read, and the airport/date arguments (plus any pyarrow-style `filters`,
+    e.g. [('Altitude', '<', 10)]) are pushed down so unrelated partitions and
+    row groups are skipped. Dates are 'YYYY-MM-DD' strings, inclusive."""
+    _require_pyarrow()
+    predicates = list(filters or [])
+    if airports is not None:
+        predicates.append(('airport', 'in', [airports] if isinstance(airports, str) else list(airports)))
+    if start_date is not None:
+        predicates.append(('date', '>=', str(start_date)))
+    if end_date is not None:
+        predicates.append(('date', '<=', str(end_date)))
+    return pd.read_parquet(root, engine='pyarrow', columns=columns, filters=predicates or None)
+
+# Export a dataset (or a filtered part of it) to CSV
+def export_dataset_csv(path, root=DATASET_DIR, **read_kwargs):
+    """Write the output of read_dataset(root, **read_kwargs) to a CSV file."""
+    df = read_dataset(root, **read_kwargs)
+    df.to_csv(path, index=False)
+    return df
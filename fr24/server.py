@@ -0,0 +1,388 @@
+"""Local stand-in for the FR24 API, for load and latency testing of the fetch layer.
+
+Serves /historic/flight-positions/full and /light, /live/flight-positions/full (replaying
+the snapshots against the wall clock), /static/airports/{code}/full,
+/static/airlines/{icao}/light, /flight-tracks and /usage from recorded or
+synthetic snapshots, with configurable latency, rate limiting (429s) and error
+injection. Every successful response is "charged" at the real credit prices.
+
+Run from the case directory, e.g.:
+    python -m fr24.server --recorded Outputs/all_flights_df.csv --port 8024 --rate-limit 10
+    export FR24_API_BASE_URL=http://127.0.0.1:8024/api
+or in-process:
+    with FR24StandIn(SnapshotStore.from_csv('Outputs/all_flights_df.csv')) as server:
+        client = FR24Client(HEADERS, base_url=server.base_url)
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from .helpers import LIGHT_FIELDS, SNAPSHOT_COLUMNS, _parse_bounds, _unix_seconds, epoch_to_datetime
+
+# Credits charged per successful response (per returned flight for flight positions)
+CREDIT_COSTS = {
+    'historic/flight-positions/full': 8,
+    'historic/flight-positions/light': 6,
+    'live/flight-positions/full': 8,
+    'static/airports/full': 50,
+    'static/airlines/light': 1,
+    'flight-tracks': 40,
+    'usage': 0,
+}
+
+# Airport records served by default (as returned by /static/airports/ARN/full)
+DEFAULT_AIRPORTS = {
+    'ARN': {
+        'name': 'Stockholm Arlanda Airport', 'iata': 'ARN', 'icao': 'ESSA',
+        'lon': 17.939816, 'lat': 59.653545, 'elevation': 137,
+        'country': {'code': 'SE', 'name': 'SWEDEN'}, 'city': 'Stockholm', 'state': None,
+        'timezone': {'name': 'Europe/Stockholm', 'offset': 3600},
+    },
+}
+
+
+# Snapshots keyed by unix timestamp
+class SnapshotStore:
+    """Recorded or synthetic flight-position snapshots. A request is answered
+    with the latest snapshot at or before its timestamp (empty before the first)."""
+
+    def __init__(self, snapshots):
+        items = snapshots.items() if isinstance(snapshots, dict) else snapshots
+        self.snapshots = {_unix_seconds(ts): flights for ts, flights in items}
+        self.timestamps = np.array(sorted(self.snapshots), dtype=np.int64)
+        self._tracks = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """Rebuild API-shaped snapshots from a long-format dataframe such as all_flights_df."""
+        fields = {column: field for column, (field, _) in SNAPSHOT_COLUMNS.items() if column in df.columns}
+        timestamps = epoch_to_datetime(df['Timestamp'])
+        eta = epoch_to_datetime(df['ETA']) if 'ETA' in df.columns else None
+        snapshots = {}
+        for ts, index in df.groupby(timestamps).groups.items():
+            frame = df.loc[index, list(fields)]
+            frame = frame.astype({c: 'Int64' for c in fields if SNAPSHOT_COLUMNS[c][1] in ('Int16', 'Int32')})
+            frame = frame.rename(columns=fields)
+            frame = frame.astype(object).where(frame.notna(), None)
+            flights = frame.to_dict('records')
+            if eta is not None:
+                for flight, value in zip(flights, eta.loc[index]):
+                    flight['eta'] = None if pd.isna(value) else value.strftime('%Y-%m-%dT%H:%M:%SZ')
+            snapshots[ts] = flights
+        return cls(snapshots)
+
+    @classmethod
+    def from_csv(cls, path):
+        return cls.from_dataframe(pd.read_csv(path, dtype={'fr24_id': str}))
+
+    def snapshot(self, timestamp):
+        position = np.searchsorted(self.timestamps, int(timestamp), side='right') - 1
+        if position < 0:
+            return []
+        return self.snapshots[int(self.timestamps[position])]
+
+    def tracks(self, flight_id):
+        """Positions of one flight across all snapshots, in /flight-tracks format."""
+        with self._lock:
+            if self._tracks is None:
+                tracks = {}
+                for ts in self.timestamps:
+                    stamp = pd.Timestamp(int(ts), unit='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+                    for flight in self.snapshots[int(ts)]:
+                        tracks.setdefault(flight.get('fr24_id'), []).append({
+                            'timestamp': stamp,
+                            'lat': flight.get('lat'), 'lon': flight.get('lon'), 'alt': flight.get('alt'),
+                            'gspeed': flight.get('gspeed'), 'vspeed': flight.get('vspeed'),
+                            'track': flight.get('track'), 'squawk': flight.get('squawk'),
+                            'callsign': flight.get('callsign'), 'source': flight.get('source'),
+                        })
+                self._tracks = tracks
+        return self._tracks.get(flight_id)
+
+
+# Parse "a-b,c-d" (or single values) into (low, high) pairs
+def _parse_ranges(value):
+    ranges = []
+    for part in value.split(','):
+        low, _, high = part.partition('-')
+        ranges.append((float(low), float(high or low)))
+    return ranges
+
+def _in_ranges(value, ranges):
+    return value is not None and any(low <= value <= high for low, high in ranges)
+
+# Apply the flight-positions query filters the stand-in understands
+def filter_flights(flights, params):
+    """Filter by airports (both:/inbound:/outbound:), flights, callsigns, bounds,
+    altitude_ranges and gspeed, then apply limit. Other filters (e.g.
+    categories) are accepted and ignored."""
+    if 'airports' in params:
+        wanted = []
+        for token in params['airports'].split(','):
+            direction, _, code = token.rpartition(':')
+            wanted.append((direction or 'both', code.upper()))
+
+        def matches(flight):
+            for direction, code in wanted:
+                if direction in ('both', 'inbound') and flight.get('dest_iata') == code:
+                    return True
+                if direction in ('both', 'outbound') and flight.get('orig_iata') == code:
+                    return True
+            return False
+        flights = [f for f in flights if matches(f)]
+    for param, field in (('flights', 'flight'), ('callsigns', 'callsign')):
+        if param in params:
+            wanted_values = {value.strip().upper() for value in params[param].split(',')}
+            flights = [f for f in flights if (f.get(field) or '').upper() in wanted_values]
+    if 'bounds' in params:
+        north, south, west, east = _parse_bounds(params['bounds'])
+        flights = [f for f in flights
+                   if f.get('lat') is not None and south <= f['lat'] <= north and west <= f['lon'] <= east]
+    if 'altitude_ranges' in params:
+        ranges = _parse_ranges(params['altitude_ranges'])
+        flights = [f for f in flights if _in_ranges(f.get('alt'), ranges)]
+    if 'gspeed' in params:
+        ranges = _parse_ranges(params['gspeed'])
+        flights = [f for f in flights if _in_ranges(f.get('gspeed'), ranges)]
+    if 'limit' in params:
+        flights = flights[:int(params['limit'])]
+    return flights
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so pooled clients reuse connections
+    standin = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, body, headers = self.standin.handle(url.path, params)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Local FR24 API stand-in
+class FR24StandIn:
+    """HTTP stand-in for the FR24 API.
+    latency/latency_jitter delay every response (seconds); rate_limit (requests
+    per second, with burst) answers excess requests with 429 and Retry-After;
+    error_rate answers that fraction of requests with error_status. The live
+    endpoint replays the snapshots from the first one at replay_speed times real
+    time, stamping each flight with the replayed time. airlines=None
+    answers every airline code with a placeholder record; a dict answers only
+    its own codes and 404s the rest. Only successful responses are charged."""
+
+    def __init__(self, snapshots=None, airports=None, airlines=None, latency=0.0, latency_jitter=0.0,
+                 rate_limit=None, burst=None, error_rate=0.0, error_status=503, replay_speed=1.0, seed=None):
+        self.snapshots = snapshots if snapshots is not None else SnapshotStore({})
+        self.airports = DEFAULT_AIRPORTS if airports is None else airports
+        self.airlines = airlines
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.rate_limit = rate_limit
+        self.burst = burst if burst is not None else max(1.0, rate_limit or 1.0)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.replay_speed = replay_speed
+        self.replay_started = time.monotonic()
+        self.random = random.Random(seed)
+        self.credits = Counter()
+        self.requests = Counter()
+        self.statuses = Counter()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def total_credits(self):
+        return sum(self.credits.values())
+
+    def usage(self):
+        """Requests, response statuses and credits charged so far."""
+        with self._lock:
+            return {
+                'requests': dict(self.requests),
+                'statuses': {str(k): v for k, v in self.statuses.items()},
+                'credits': dict(self.credits),
+                'total_credits': sum(self.credits.values()),
+            }
+
+    def _allow(self):
+        # Non-blocking token bucket: refuse instead of waiting
+        if self.rate_limit is None:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def _route(self, path, params):
+        # Returns (endpoint key, status, body, credits) for a path relative to /api
+        if path in ('historic/flight-positions/full', 'historic/flight-positions/light'):
+            if 'timestamp' not in params:
+                return path, 400, {'message': 'Validation error', 'details': 'The timestamp field is required.'}, 0
+            flights = filter_flights(self.snapshots.snapshot(params['timestamp']), params)
+            if path.endswith('/light'):
+                stamp = pd.Timestamp(int(params['timestamp']), unit='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+                flights = [dict({field: flight.get(field) for field in LIGHT_FIELDS}, timestamp=stamp)
+                           for flight in flights]
+            return path, 200, {'data': flights}, len(flights) * CREDIT_COSTS[path]
+        if path == 'live/flight-positions/full':
+            now = int(self.replay_time())
+            flights = filter_flights(self.snapshots.snapshot(now), params)
+            stamp = pd.Timestamp(now, unit='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+            flights = [dict(flight, timestamp=stamp) for flight in flights]
+            return path, 200, {'data': flights}, len(flights) * CREDIT_COSTS[path]
+        match = re.fullmatch(r'static/airports/(\w+)/full', path)
+        if match:
+            airport = self.airports.get(match.group(1).upper())
+            if airport is None:
+                return 'static/airports/full', 404, {'message': 'Not found'}, 0
+            return 'static/airports/full', 200, airport, CREDIT_COSTS['static/airports/full']
+        match = re.fullmatch(r'static/airlines/(\w+)/light', path)
+        if match:
+            icao = match.group(1).upper()
+            if self.airlines is None:
+                airline = {'name': f"{icao} Airline", 'iata': None, 'icao': icao}
+            else:
+                airline = self.airlines.get(icao)
+            if airline is None:
+                return 'static/airlines/light', 404, {'message': 'Not found'}, 0
+            return 'static/airlines/light', 200, airline, CREDIT_COSTS['static/airlines/light']
+        if path == 'flight-tracks':
+            tracks = self.snapshots.tracks(params.get('flight_id'))
+            if tracks is None:
+                return path, 404, {'message': 'Not found'}, 0
+            return path, 200, [{'fr24_id': params['flight_id'], 'tracks': tracks}], CREDIT_COSTS[path]
+        if path == 'usage':
+            return path, 200, self.usage(), 0
+        return path, 404, {'message': 'Not found'}, 0
+
+    def replay_time(self):
+        """Unix time the live endpoint is currently replaying."""
+        first = int(self.snapshots.timestamps[0]) if len(self.snapshots.timestamps) else int(time.time())
+        return first + (time.monotonic() - self.replay_started) * self.replay_speed
+
+    def handle(self, path, params):
+        """Answer one request; returns (status, body, extra headers)."""
+        path = path.strip('/')
+        path = path[4:] if path.startswith('api/') else path
+        delay = self.latency + (self.random.uniform(0, self.latency_jitter) if self.latency_jitter else 0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            allowed = self._allow()
+            failed = self.error_rate and self.random.random() < self.error_rate
+        if not allowed:
+            status, body, headers = 429, {'message': 'Too Many Requests'}, {'Retry-After': '1'}
+            endpoint, credits = path, 0
+        elif failed:
+            status, body, headers = self.error_status, {'message': 'Injected error'}, {}
+            endpoint, credits = path, 0
+        else:
+            endpoint, status, body, credits = self._route(path, params)
+            headers = {}
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.statuses[status] += 1
+            if status == 200:
+                self.credits[endpoint] += credits
+        return status, body, headers
+
+    def start(self, host='127.0.0.1', port=0):
+        """Serve in a background thread and return the base URL (port 0 picks a free port)."""
+        handler = type('Handler', (_Handler,), {'standin': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self.replay_started = time.monotonic()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the FR24 API.")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--recorded', help="long-format CSV of recorded snapshots (e.g. Outputs/all_flights_df.csv)")
+    source.add_argument('--synthetic', type=int, metavar='FLIGHTS', help="serve synthetic traffic with this many flights")
+    parser.add_argument('--timestamps', type=int, default=100, help="synthetic snapshots to generate")
+    parser.add_argument('--interval-minutes', type=float, default=30)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8024)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, help="requests per second before answering 429")
+    parser.add_argument('--burst', type=float)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--replay-speed', type=float, default=1.0, help="live endpoint replay speed-up")
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    if args.recorded:
+        snapshots = SnapshotStore.from_csv(args.recorded)
+    elif args.synthetic:
+        from .bench import generate_snapshots
+        snapshots = SnapshotStore(generate_snapshots(args.synthetic, args.timestamps, args.interval_minutes))
+    else:
+        snapshots = SnapshotStore({})
+
+    server = FR24StandIn(snapshots, latency=args.latency, latency_jitter=args.latency_jitter,
+                         rate_limit=args.rate_limit, burst=args.burst, error_rate=args.error_rate,
+                         error_status=args.error_status, replay_speed=args.replay_speed, seed=args.seed)
+    base_url = server.start(args.host, args.port)
+    print(f"Serving {len(snapshots.timestamps)} snapshots at {base_url}")
+    print(f"export FR24_API_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print(json.dumps(server.usage(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
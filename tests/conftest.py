@@ -0,0 +1,63 @@
+"""Shared fixtures: synthetic traffic served by the local FR24 stand-in."""
+import contextlib
+import io
+
+import pytest
+
+from fr24.bench import DEFAULT_AIRPORT, generate_snapshots
+from fr24.helpers import FR24Client, TokenBucket
+from fr24.server import FR24StandIn, SnapshotStore
+
+HEADERS = {'Authorization': 'Bearer test'}
+
+# Airports of the synthetic traffic (GOT is one of the far ends of ARN's flights)
+AIRPORTS = {
+    'ARN': DEFAULT_AIRPORT,
+    'GOT': {'iata': 'GOT', 'lat': 57.662799, 'lon': 12.27980},
+}
+
+
+@pytest.fixture(scope='session')
+def snapshots():
+    """{timestamp: flights} for 300 flights over 6 hours, with dropped fields."""
+    return dict(generate_snapshots(300, 12, 30, missing_rate=0.05))
+
+
+@pytest.fixture(scope='session')
+def timestamps(snapshots):
+    return sorted(snapshots)
+
+
+@pytest.fixture(scope='session')
+def complete_snapshots():
+    """The same traffic every 5 minutes with no dropped fields, so full and light records agree."""
+    return dict(generate_snapshots(300, 72, 5, missing_rate=0))
+
+
+@pytest.fixture
+def standin(snapshots):
+    with FR24StandIn(SnapshotStore(snapshots)) as server:
+        yield server
+
+
+# Client for a stand-in, without the 2 requests/second default pacing
+def _client(server):
+    return FR24Client(HEADERS, base_url=server.base_url, limiter=TokenBucket(rate=1000))
+
+
+@pytest.fixture
+def client(standin):
+    with _client(standin) as client:
+        yield client
+
+
+@pytest.fixture
+def complete_client(complete_snapshots):
+    with FR24StandIn(SnapshotStore(complete_snapshots)) as server, _client(server) as client:
+        yield client
+
+
+@pytest.fixture
+def quiet():
+    """Silence the cost and per-interval prints of the helpers."""
+    return contextlib.redirect_stdout(io.StringIO())
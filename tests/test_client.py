@@ -0,0 +1,24 @@
+"""Shared client and rate limiter behaviour."""
+from fr24.cli import build_parser
+from fr24.helpers import TokenBucket, get_client
+
+
+def test_shared_client_keeps_one_limiter():
+    headers = {'Authorization': 'Bearer limiter-test'}
+    limiter = get_client(headers).limiter
+    assert isinstance(limiter, TokenBucket) and get_client(headers).limiter is limiter
+
+    # A 429 backoff outlives the call that hit it
+    limiter.backoff()
+    assert get_client(headers).limiter.rate == limiter.max_rate / 2
+
+    paced = get_client(headers, rate=5).limiter
+    assert paced is not limiter and paced.max_rate == 5
+    assert get_client(headers, rate=5).limiter is paced and get_client(headers).limiter is paced
+
+
+def test_rate_option():
+    parser = build_parser()
+    assert parser.parse_args(['collect', 'ARN', '--start', '2024-01-01T00:00']).rate == 2.0
+    assert parser.parse_args(['detect', 'ARN', '--start', '2024-01-01T00:00', '--rate', '0.5']).rate == 0.5
+    assert parser.parse_args(['report', '--flights', 'f.csv', '--rate', '4']).rate == 4
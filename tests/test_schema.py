@@ -0,0 +1,17 @@
+"""apply_schema dtype coercion."""
+import pandas as pd
+
+from fr24.helpers import apply_schema
+
+
+def test_apply_schema_rounds_fractional_integer_columns():
+    df = pd.DataFrame({
+        'Altitude_start': [1012.6, None], 'Ground_Speed': [141.5, 12.2], 'Track': ['90.4', None],
+        'Lat': [59.65123, 59.6], 'Timestamp': [1740027600.4, 1740027601.6],
+    })
+    out = apply_schema(df)
+    assert out['Altitude_start'].dtype == 'Int32' and out['Altitude_start'].tolist() == [1013, pd.NA]
+    assert out['Ground_Speed'].dtype == 'Int16' and out['Ground_Speed'].tolist() == [142, 12]
+    assert out['Track'].tolist() == [90, pd.NA]
+    assert out['Lat'].dtype == 'float32' and abs(float(out['Lat'].iloc[0]) - 59.65123) < 1e-5
+    assert out['Timestamp'].tolist() == [1740027600, 1740027602]
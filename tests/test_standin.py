@@ -0,0 +1,108 @@
+"""End-to-end checks of the fetch and detection paths against the stand-in server."""
+import os
+
+import pandas as pd
+import pytest
+from conftest import AIRPORTS, HEADERS
+
+from fr24.cache import MetadataCache, SnapshotCache, SnapshotCacheMiss
+from fr24.helpers import (
+    IntervalStream, adaptive_snapshots, get_airline_info, get_hybrid_snapshots, get_snapshots, read_chunked_detections,
+    run_chunked, run_multi_airport, time_chunks,
+)
+
+
+# Detections of one airport from its own both:<code> query
+def _single_airport(client, timestamps, code):
+    airport = AIRPORTS[code]
+    flights_list, _ = get_snapshots(timestamps, code, HEADERS, client=client)
+    stream = IntervalStream(airport['iata'], airport['lat'], airport['lon'], 5)
+    stream.run(zip(timestamps, flights_list))
+    return stream
+
+
+def test_multi_airport_matches_single_airport_runs(client, timestamps, quiet):
+    with quiet:
+        results, _ = run_multi_airport(AIRPORTS, timestamps, HEADERS, client=client, max_workers=2)
+        for code in AIRPORTS:
+            single = _single_airport(client, timestamps, code)
+            assert sorted(results[code]['arrivals']['fr24_id']) == sorted(single.arrivals_df()['fr24_id'])
+            assert sorted(results[code]['departures']['fr24_id']) == sorted(single.departures_df()['fr24_id'])
+            assert results[code]['flights'] == len(single.flight_ids)
+
+
+def test_adaptive_snapshots_accepts_naive_times(client, timestamps, quiet):
+    arn = AIRPORTS['ARN']
+    start, end = timestamps[0], timestamps[4]
+    with quiet:
+        aware, _ = adaptive_snapshots(start, end, 'ARN', 'ARN', arn['lat'], arn['lon'], HEADERS,
+                                      min_minutes=10, client=client, max_workers=2)
+        naive, _ = adaptive_snapshots(start.replace(tzinfo=None), end.replace(tzinfo=None), 'ARN', 'ARN',
+                                      arn['lat'], arn['lon'], HEADERS, min_minutes=10, client=client)
+    assert [ts for ts, _ in naive] == [ts for ts, _ in aware]
+    assert len(aware) > 5  # Some intervals were refined
+
+
+def test_chunked_run_matches_single_stream(client, timestamps, tmp_path, quiet):
+    arn = AIRPORTS['ARN']
+    with quiet:
+        single = _single_airport(client, timestamps, 'ARN')
+        fetch = lambda times: zip(times, get_snapshots(times, 'ARN', HEADERS, client=client)[0])
+        chunks = list(time_chunks(timestamps[0], timestamps[-1], 30, chunk_hours=2))
+        summary = run_chunked(IntervalStream('ARN', arn['lat'], arn['lon'], 5, 30), chunks, fetch, str(tmp_path))
+        # A rerun after losing one chunk recomputes only that chunk
+        os.remove(os.path.join(summary['run_dir'], 'arrivals', f"{summary['labels'][1]}.csv"))
+        rerun = run_chunked(IntervalStream('ARN', arn['lat'], arn['lon'], 5, 30), chunks, fetch, str(tmp_path))
+    assert summary['intervals'] == rerun['intervals'] == single.intervals
+    assert (rerun['chunks'], rerun['skipped']) == (1, len(chunks) - 1)
+    for kind, expected in (('arrivals', single.arrivals_df()), ('departures', single.departures_df())):
+        merged = read_chunked_detections(rerun['run_dir'], rerun['labels'], kind)
+        pd.testing.assert_frame_equal(merged.reset_index(drop=True), expected[merged.columns].reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+
+
+def test_hybrid_matches_full_snapshots(complete_client, complete_snapshots, quiet):
+    timestamps = sorted(complete_snapshots)
+    with quiet:
+        full, full_cost = get_snapshots(timestamps, 'ARN', HEADERS, client=complete_client)
+        hybrid, hybrid_cost = get_hybrid_snapshots(timestamps, 'ARN', HEADERS, full_every=6, client=complete_client)
+    fields = ('fr24_id', 'flight', 'orig_iata', 'dest_iata', 'type', 'lat', 'lon', 'alt', 'gspeed')
+    for full_flights, hybrid_flights in zip(full, hybrid):
+        assert sorted(tuple(f.get(k) for k in fields) for f in hybrid_flights) == \
+            sorted(tuple(f.get(k) for k in fields) for f in full_flights)
+    assert hybrid_cost['total_credits'] < full_cost['total_credits']
+
+
+def test_offline_cache_misses_never_reach_the_api(client, standin, timestamps, tmp_path, quiet):
+    offline = SnapshotCache(str(tmp_path), offline=True)
+    with pytest.raises(SnapshotCacheMiss):
+        get_snapshots(timestamps[:2], 'ARN', HEADERS, client=client, cache=offline)
+    assert standin.total_credits == 0
+
+    with quiet:
+        online, _ = get_snapshots(timestamps[:2], 'ARN', HEADERS, client=client, cache=SnapshotCache(str(tmp_path)))
+    paid = standin.total_credits
+    cached, cost = get_snapshots(timestamps[:2], 'ARN', HEADERS, client=client, cache=offline)
+    assert cached == online and cost['total_credits'] == 0 and cost['cached_snapshots'] == 2
+    assert standin.total_credits == paid
+    with pytest.raises(SnapshotCacheMiss):
+        get_snapshots(timestamps[2:3], 'ARN', HEADERS, client=client, cache=offline)
+
+
+def test_airline_lookups_save_the_cache_once(client, standin, tmp_path):
+    path = str(tmp_path / 'airlines.json')
+    with MetadataCache(path) as cache:
+        for code in ('SAS', 'NAX', 'SAS'):
+            assert get_airline_info(code, HEADERS, client=client, cache=cache)['icao'] == code
+        assert not os.path.exists(path)
+    assert standin.total_credits == 2
+    assert MetadataCache(path).get('NAX') == (True, {'name': 'NAX Airline', 'iata': None, 'icao': 'NAX'})
+
+
+def test_fetches_share_the_client_limiter(client, standin, timestamps, quiet):
+    acquired, acquire = [], client.limiter.acquire
+    client.limiter.acquire = lambda: acquired.append(1) or acquire()
+    with quiet:
+        get_snapshots(timestamps[:3], 'ARN', HEADERS, client=client)
+        get_hybrid_snapshots(timestamps[3:9], 'ARN', HEADERS, full_every=3, client=client)
+    assert len(acquired) == sum(standin.requests.values())
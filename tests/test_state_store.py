@@ -0,0 +1,22 @@
+"""FlightStateStore eviction by time."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fr24.helpers import FlightStateStore
+
+
+# Store with one flight last seen at 100 s and one at 2000 s
+def _store():
+    store = FlightStateStore()
+    for fr24_id, seen in (('39000001', 100), ('39000002', 2000)):
+        store.update([{'fr24_id': fr24_id, 'lat': 59.6, 'lon': 17.9, 'alt': 0, 'gspeed': 10}], seen)
+    return store
+
+
+@pytest.mark.parametrize('before', [1500, 1500.0, np.int64(1500), np.float64(1500.0),
+                                    pd.Timestamp(1500, unit='s', tz='UTC')])
+def test_evict_reads_numbers_as_unix_seconds(before):
+    store = _store()
+    assert store.evict(before) == 1
+    assert '39000002' in store and '39000001' not in store